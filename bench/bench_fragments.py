@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""채널 조각 합치기 벤치마크: os.sendfile vs 읽어서 쓰기
+
+    python bench/bench_fragments.py [--channels 300] [--days 7] [-n 5]
+
+sample_epginfo()로 채널별 조각을 임시 디렉토리에 만들고 FragmentStore.assemble()로
+하나의 파일에 합치는 시간을 잰다. 읽어서 쓰기는 압축하거나 여러 파일에 쓸 때
+(TeeWriter) 쓰는 방법이다.
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+from common import load_epg2xml, sample_epginfo, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--channels', type=int, default=300)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('-n', type=int, default=5, help='반복 횟수 (가장 빠른 값을 쓴다)')
+    args = parser.parse_args()
+
+    epg = load_epg2xml(addverbose='y')
+    with tempfile.TemporaryDirectory() as tmp:
+        epg.fragments = epg.FragmentStore(os.path.join(tmp, 'fragments'))
+        for epginfo in sample_epginfo(args.channels, args.days, record=epg.Programme):
+            epg.writeChannel(epginfo[0].channelId, ['채널 %s' % epginfo[0].channelId], '')
+            epg.epgzip(epginfo)
+        epg.fragments.commit_all()
+        size = sum(os.path.getsize(x) for x in epg.fragments.files())
+
+        def assemble(tee):
+            with open(os.path.join(tmp, 'xmltv.xml'), 'wb', buffering=1024 * 1024) as f:
+                epg.fragments.assemble(epg.TeeWriter([f]) if tee else f)
+
+        print('조각 %d개, %.1fMB' % (len(epg.fragments.files()), size / 1048576))
+        for label, tee in [('os.sendfile', False), ('read + write', True)]:
+            elapsed = timeit(assemble, tee, repeat=args.n)
+            print('%-12s %8.1f ms  %8.0f MB/s' % (label, elapsed * 1000, size / 1048576 / elapsed))
+        epg.fragments = None
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""프로그램 표현 방식별 메모리 벤치마크: 11칸 list vs Programme
+
+    python bench/bench_memory.py [--channels 300] [--days 7]
+
+방식마다 새 프로세스에서 채널 x 일자 만큼의 프로그램을 모두 만들어 들고 있을 때
+늘어난 최대 RSS(ru_maxrss)를 잰다. 파서가 페이지마다 새 문자열을 만드는 것처럼
+모든 문자열 필드는 복사본을 넣는다.
+"""
+import sys
+import resource
+import argparse
+import subprocess
+
+from common import load_epg2xml, sample_epginfo
+
+MODES = ['list', 'Programme']
+
+
+def fresh(value):
+    return value.encode('utf-8').decode('utf-8') if isinstance(value, str) else value
+
+
+def measure(mode, channels, days):
+    """mode 방식으로 만든 epginfo를 들고 있을 때 늘어난 최대 RSS(KB)와 프로그램 수"""
+    epg = load_epg2xml()
+    if mode == 'list':
+        def record(*fields):
+            return [fresh(x) for x in fields]
+    else:
+        def record(*fields):
+            return epg.Programme(*[fresh(x) for x in fields])
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    data = sample_epginfo(channels, days, record=record)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return after - before, sum(len(x) for x in data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--channels', type=int, default=300)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print('%d %d' % measure(args.mode, args.channels, args.days))
+        return 0
+
+    results = {}
+    for mode in MODES:
+        out = subprocess.check_output([sys.executable, __file__, '--mode', mode, '--channels', str(args.channels), '--days', str(args.days)])
+        results[mode] = [int(x) for x in out.split()]
+    programs = results['list'][1]
+    print('%d채널 x %d일 = %d개 프로그램' % (args.channels, args.days, programs))
+    for mode in MODES:
+        kb = results[mode][0]
+        print('%-10s %8.1f MB %8.0f bytes/programme  (x%.2f)' % (mode, kb / 1024, kb * 1024 / programs, results['list'][0] / max(kb, 1)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""XMLTV 합치기 벤치마크: 입력 크기별 시간과 최대 RSS
+
+    python bench/bench_merge.py [--channels 300] [--days 7,14,28] [--buffer 50000]
+
+sample_epginfo()로 시드만 다른 XMLTV 파일 2개(두번째는 gzip)를 만들고 새 프로세스에서
+merge.merge()로 합칠 때 걸린 시간과 늘어난 최대 RSS(ru_maxrss)를 잰다. 두 파일의
+시각이 같으므로 절반은 겹쳐서 버려진다. 입력이 커져도 RSS는 buffer만큼에서 멈춘다.
+"""
+import os
+import sys
+import gzip
+import time
+import resource
+import argparse
+import tempfile
+import subprocess
+
+from common import load_epg2xml, sample_epginfo
+
+
+def make_input(epg, path, channels, days, seed):
+    epg.xmlout = gzip.open(path, 'wb') if path.endswith('.gz') else open(path, 'wb')
+    epg.addverbose = 'y'
+    epg.xmlwrite(epg.xml_header())
+    data = sample_epginfo(channels, days, seed=seed, record=epg.Programme)
+    for epginfo in data:
+        epg.writeChannel(epginfo[0].channelId, ['채널 %s' % epginfo[0].channelId], '')
+    for epginfo in data:
+        epg.epgzip(epginfo)
+    epg.xmlwrite('</tv>\n')
+    epg.xmlout.close()
+
+
+def measure(inputs, buffer):
+    """합치는 데 걸린 시간(초), 늘어난 최대 RSS(KB), 내보낸 프로그램 수"""
+    load_epg2xml()
+    from epg2xml import merge
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(os.devnull, 'wb') as out:
+        stats = merge.merge(inputs, out, buffer)
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before, stats['programmes_out']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--channels', type=int, default=300)
+    parser.add_argument('--days', default='7,14,28')
+    parser.add_argument('--buffer', type=int, default=50000)
+    parser.add_argument('--measure', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print('%f %d %d' % measure(args.measure, args.buffer))
+        return 0
+
+    epg = load_epg2xml()
+    print('%d채널, buffer=%d' % (args.channels, args.buffer))
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in [int(x) for x in args.days.split(',')]:
+            inputs = [os.path.join(tmp, 'a.xml'), os.path.join(tmp, 'b.xml.gz')]
+            for seed, path in enumerate(inputs):
+                make_input(epg, path, args.channels, days, seed)
+            size = sum(os.path.getsize(x) for x in inputs)
+            out = subprocess.check_output([sys.executable, __file__, '--buffer', str(args.buffer), '--measure'] + inputs)
+            elapsed, kb, programmes = out.split()
+            print('%3d일 입력 %6.1fMB  %7.2f s  %8.0f programmes/s  RSS +%6.1f MB' % (
+                days, size / 1048576, float(elapsed), int(programmes) * 2 / float(elapsed), int(kb) / 1024))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""페이지 수를 모르는 API의 paginate() 벤치마크
+
+    python bench/bench_paginate.py [--pages 1,2,5,12] [--burst 1,4] [--delay 0.05]
+
+TVING처럼 더 있는지만 알려주는 API를 흉내내는 get_page()로 paginate()를 실행해서
+걸린 시간, 요청 수, 동시에 진행된 최대 요청 수를 보여준다. 끝은 세 가지로 알린다.
+  has_more  마지막 페이지가 더 없다고 알림 (TVING)
+  empty     마지막 페이지 뒤에 빈 페이지가 옴
+  error     마지막 페이지 뒤를 요청하면 에러
+burst가 1이면 한 페이지씩 요청한다. 어느 경우든 결과는 전체 목록과 같아야 한다.
+"""
+import sys
+import time
+import argparse
+import threading
+
+from common import load_epg2xml
+
+HOST = 'paginate.test'
+SIZE = 20
+
+
+class FakeApi:
+    def __init__(self, pages, end, delay):
+        self.pages, self.end, self.delay = pages, end, delay
+        self.lock = threading.Lock()
+        self.inflight = self.max_inflight = 0
+
+    def get_page(self, n):
+        with self.lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            time.sleep(self.delay)
+            if n > self.pages and self.end == 'error':
+                raise ValueError('page %d' % n)
+            items = list(range((n - 1) * SIZE, n * SIZE)) if n <= self.pages else []
+            if self.end == 'has_more':
+                return items, None if n < self.pages else n
+            return items, None
+        finally:
+            with self.lock:
+                self.inflight -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', default='1,2,5,12', help='데이터 페이지 수 목록')
+    parser.add_argument('--burst', default='1,4', help='호스트 burst 목록')
+    parser.add_argument('--delay', type=float, default=0.05, help='응답 지연(초)')
+    args = parser.parse_args()
+
+    epg = load_epg2xml()
+    url = 'https://%s/schedules' % HOST
+    print('%-8s %5s %5s %9s %6s %8s' % ('끝', 'pages', 'burst', 'ms', '요청', '최대 동시'))
+    for end in ['has_more', 'empty', 'error']:
+        for pages in [int(x) for x in args.pages.split(',')]:
+            for burst in [int(x) for x in args.burst.split(',')]:
+                epg.host_limits[HOST] = (100, burst)
+                api = FakeApi(pages, end, args.delay)
+                start = time.perf_counter()
+                items, requested = epg.paginate(api.get_page, url)
+                elapsed = time.perf_counter() - start
+                if items != list(range(pages * SIZE)):
+                    print('결과가 다릅니다: %s pages=%d burst=%d' % (end, pages, burst))
+                    return 1
+                print('%-8s %5d %5d %9.0f %6d %8d' % (end, pages, burst, elapsed * 1000, requested, api.max_inflight))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
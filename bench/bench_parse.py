@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""HTML 소스 파서 벤치마크: lxml XPath vs BeautifulSoup
+
+    python bench/bench_parse.py [-n 50]
+
+fixtures/의 KT, LG, SKB, NAVER 페이지를 각 파서로 읽어 epginfo가 같은지 확인하고
+소스별 처리 속도를 잰다. 결과가 하나라도 다르면 종료 코드 1로 끝난다.
+"""
+import sys
+import json
+import argparse
+
+from common import load_epg2xml, load_fixtures, timeit
+
+ChannelInfo = [1, '테스트', '', '1']
+
+
+def pages(source):
+    result = []
+    for name, day, data in load_fixtures(source):
+        if source == 'NAVER':
+            data = ''.join(json.loads(data)['dataHtml'])
+        result.append((name, day, data))
+    return result
+
+
+def parse(epg, func, data, day):
+    try:
+        return list(func(data, ChannelInfo, day))
+    except epg.NoEpgData:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=50, help='반복 횟수')
+    args = parser.parse_args()
+
+    epg = load_epg2xml()
+    if epg.htmlparser != 'lxml':
+        print('lxml 모듈이 필요합니다.')
+        return 1
+    failed = False
+    print('%-6s %-14s %10s %12s' % ('소스', '파서', 'pages/s', 'programmes/s'))
+    for source, (lxml_parser, soup_parser) in epg.HTML_PARSERS.items():
+        samples = pages(source)
+        programs = sum(len(parse(epg, lxml_parser, data, day) or []) for _, day, data in samples)
+        backends = [('lxml xpath', 'lxml', lxml_parser), ('bs4 lxml', 'lxml', soup_parser), ('bs4 html.parser', 'html.parser', soup_parser)]
+        for label, htmlparser, func in backends:
+            epg.htmlparser = htmlparser
+            for name, day, data in samples:
+                if parse(epg, func, data, day) != parse(epg, lxml_parser, data, day):
+                    print('결과가 다릅니다: %s %s %s' % (source, label, name))
+                    failed = True
+            elapsed = timeit(lambda: [parse(epg, func, data, day) for _ in range(args.n) for _, day, data in samples])
+            print('%-6s %-14s %10.0f %12.0f' % (source, label, args.n * len(samples) / elapsed, args.n * programs / elapsed))
+        epg.htmlparser = 'lxml'
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
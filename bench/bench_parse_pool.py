@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""파싱 프로세스 벤치마크: 요청 스레드에서 파싱 vs parse_pool
+
+    python bench/bench_parse_pool.py [--workers 4] [--parse-workers 0,2,4] [--delay 0.02] [-n 5]
+
+fixtures/의 KT, LG, SKB, NAVER 페이지를 (채널, 날짜)마다 delay초 걸려 받는 것처럼
+fetch_day를 만들어 fetch_days()로 돌린다. parse_workers가 0이면 요청 스레드에서 직접
+파싱하고, 아니면 parse_page()가 Future를 돌려주고 요청 스레드는 다음 페이지를 받으러 간다.
+프로세스를 띄우는 시간은 빼고 잰다. CPU 코어가 하나뿐이면 빨라지지 않는다.
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_parse import ChannelInfo, pages
+from common import load_epg2xml, timeit
+
+
+def run(epg, samples, delay):
+    """samples 하나를 채널 하나로 보고 fetch_days()로 읽어 채널별 epginfo 목록을 돌려준다"""
+    ChannelInfos = [[i] + ChannelInfo[1:] for i in range(len(samples))]
+
+    def fetch_day(ChannelInfo, day):
+        source, _, data = samples[ChannelInfo[0]]
+        time.sleep(delay)
+        return epg.parse_page(source, data, ChannelInfo, day)
+    return [epginfo for _, epginfo in epg.fetch_days(ChannelInfos, fetch_day)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='요청 스레드 수')
+    parser.add_argument('--parse-workers', default='0,2,4', help='파싱 프로세스 수 목록')
+    parser.add_argument('--delay', type=float, default=0.02, help='요청 하나의 응답 지연(초)')
+    parser.add_argument('-n', type=int, default=5, help='페이지 반복 횟수')
+    args = parser.parse_args()
+
+    epg = load_epg2xml(workers=args.workers, period=1, state=None)
+    epg.log.disabled = True     # 빈 페이지 경고
+    samples = [(source, day, data) for source in epg.HTML_PARSERS for _, day, data in pages(source)] * args.n
+    expected = run(epg, samples, 0)
+    print('CPU %d개, 요청 스레드 %d개, 페이지 %d개, 응답 지연 %.0fms' % (os.cpu_count(), args.workers, len(samples), args.delay * 1000))
+    for count in [int(x) for x in args.parse_workers.split(',')]:
+        if count:
+            epg.parse_pool = ProcessPoolExecutor(count, mp_context=multiprocessing.get_context('spawn'))
+            list(epg.parse_pool.map(abs, range(count * 4)))
+        if run(epg, samples, 0) != expected:
+            print('결과가 다릅니다: parse_workers=%d' % count)
+            return 1
+        elapsed = timeit(run, epg, samples, args.delay)
+        print('parse_workers=%-3d %8.0f pages/s' % (count, len(samples) / elapsed))
+        if epg.parse_pool is not None:
+            epg.parse_pool.shutdown()
+            epg.parse_pool = None
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
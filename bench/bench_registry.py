@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""채널 선택 벤치마크: cid_bin + MyChannels 목록 vs ChannelRegistry
+
+    python bench/bench_registry.py [--channels 5000] [-n 5]
+
+Channel.json에 채널이 많을 때 MyChannels(-c) 범위를 풀어서 고르고 소스별로
+나누는 데 걸리는 시간을 잰다. 예전 방식은 Id마다 문자열 목록을 훑는다.
+"""
+import sys
+import random
+import argparse
+
+from common import load_epg2xml, timeit
+
+SOURCES = ['KT', 'LG', 'SK', 'SKB', 'NAVER']
+SPEC = '-100,250,300-2000,2500-'
+
+
+def sample_channels(count, seed=0):
+    rnd = random.Random(seed)
+    return [{'Id': i + 1, 'Name': 'CH %d' % i, 'Source': rnd.choice(SOURCES + ['WAVVE', 'TVING']), 'ServiceId': str(i)} for i in range(count)]
+
+
+def legacy(channels, spec):
+    cids = [x['Id'] for x in channels if 'Id' in x]
+    min_cid, max_cid = min(cids), max(cids)
+    cid_bin = [0] * (max_cid+1)
+    for r in spec.split(','):
+        first, last = min_cid-1, max_cid
+        if r.strip() != '*':
+            ends = r.split('-')
+            if len(ends) == 1:
+                first = last = int(r)
+            else:
+                a, b = ends
+                first = int(a) if a.strip() != '' else first
+                last = int(b) if b.strip() != '' else last
+        first, last = max(first, min_cid), min(last, max_cid)
+        for i in range(first, last+1):
+            cid_bin[i] = 1
+    MyChannels = [str(x) for x, y in enumerate(cid_bin) if y == 1]
+    infos = [[x['Id'], x['Name'], x['Source'], x['ServiceId']] for x in channels if x['Source'] in SOURCES and str(x['Id']) in MyChannels]
+    return {source: [x for x in infos if x[2] == source] for source in SOURCES}
+
+
+def indexed(epg, channels, spec):
+    registry = epg.ChannelRegistry(channels)
+    registry.select(spec)
+    return {source: [[x['Id'], x['Name'], x['Source'], x['ServiceId']] for x in registry.batch(source) if registry.selected(x)] for source in SOURCES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--channels', type=int, default=5000)
+    parser.add_argument('-n', type=int, default=5, help='반복 횟수 (가장 빠른 값을 쓴다)')
+    args = parser.parse_args()
+
+    epg = load_epg2xml()
+    channels = sample_channels(args.channels)
+    assert legacy(channels, SPEC) == indexed(epg, channels, SPEC)
+    old = timeit(legacy, channels, SPEC, repeat=args.n)
+    new = timeit(indexed, epg, channels, SPEC, repeat=args.n)
+    print('%d개 채널, MyChannels=%s' % (args.channels, SPEC))
+    print('cid_bin + 목록    %8.1f ms' % (old * 1000))
+    print('ChannelRegistry   %8.1f ms  (x%.1f)' % (new * 1000, old / new))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
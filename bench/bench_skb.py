@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""SKB 편성표 전처리 벤치마크: 이전 12번의 re.sub vs preprocess_skb()
+
+    python bench/bench_skb.py [PAGE.html ...]
+
+저장해둔 SKB Channel_List.do 페이지를 주면 그것으로, 없으면 비슷한 구조로
+만든 페이지로 채널-날짜 하나당 전처리 시간과 최대 메모리를 잰다.
+"""
+import re
+import sys
+import tracemalloc
+from functools import partial
+from xml.sax.saxutils import unescape
+
+from common import load_epg2xml, timeit
+
+
+def legacy_preprocess(data):
+    def replacement(match, tag):
+        if match:
+            tag = tag.strip()
+            programName = unescape(match.group(1)).replace('<', '&lt;').replace('>', '&gt;').strip()
+            programName = '<' + tag + ' class="cont">' + programName
+            return programName
+        else:
+            return ''
+
+    data = re.sub('EUC-KR', 'utf-8', data)
+    data = re.sub('<!--(.*?)-->', '', data, 0, re.I | re.S)
+    data = re.sub('<span class="round_flag flag02">(.*?)</span>', '', data)
+    data = re.sub('<span class="round_flag flag03">(.*?)</span>', '', data)
+    data = re.sub('<span class="round_flag flag04">(.*?)</span>', '', data)
+    data = re.sub('<span class="round_flag flag09">(.*?)</span>', '', data)
+    data = re.sub('<span class="round_flag flag10">(.*?)</span>', '', data)
+    data = re.sub('<span class="round_flag flag11">(.*?)</span>', '', data)
+    data = re.sub('<span class="round_flag flag12">(.*?)</span>', '', data)
+    data = re.sub('<strong class="hide">프로그램 안내</strong>', '', data)
+    data = re.sub('<p class="cont">(.*)', partial(replacement, tag='p'), data)
+    data = re.sub('<p class="tit">(.*)', partial(replacement, tag='p'), data)
+    return data
+
+
+def sample_page(programs=45):
+    head = '<!DOCTYPE html>\n<html lang="ko">\n<head>\n<meta http-equiv="Content-Type" content="text/html; charset=EUC-KR">\n'
+    head += ''.join('<script src="/js/lib%d.js"></script>\n<!-- script %d\n  comment -->\n' % (i, i) for i in range(40))
+    head += '<style>' + '.c{color:#000}\n' * 500 + '</style>\n</head>\n<body>\n'
+    items = []
+    for i in range(programs):
+        flags = ''.join('<span class="round_flag flag%s">%s</span>' % (f, f) for f in ['02', '09', '12'][:i % 4])
+        items.append('<li class="list">\n<p class="time">%02d:%02d</p>\n<p class="tit">프로그램</p>\n'
+                     '<p class="cont">드라마 %d &lt;부제 %d&gt;(%d회)(재)%s\n</p>\n<i class="hide">%d세 이상</i>\n</li>\n'
+                     % (i // 2, (i % 2) * 30, i, i, i + 1, flags, [0, 12, 15, 19][i % 4]))
+    body = '<div id="uiScheduleTabContent"><strong class="hide">프로그램 안내</strong>\n<ul>\n' + ''.join(items) + '</ul>\n</div>\n'
+    foot = '<!-- footer -->\n' + '<div class="menu"><a href="#">메뉴</a></div>\n' * 300 + '</body>\n</html>\n'
+    return head + body + foot
+
+
+def peak_memory(func, data):
+    tracemalloc.start()
+    func(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    epg = load_epg2xml()
+    pages = []
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    pages = pages or [sample_page()]
+
+    for func in (legacy_preprocess, epg.preprocess_skb):
+        func(pages[0])
+    for page in pages:
+        if legacy_preprocess(page) != epg.preprocess_skb(page):
+            print('결과가 다릅니다: %d bytes 페이지' % len(page))
+
+    n = 200
+    size = sum(len(x.encode('utf-8')) for x in pages) / len(pages)
+    print('페이지 %d개, 평균 %.0f KB' % (len(pages), size / 1024))
+    result = {}
+    for name, func in (('re.sub x12', legacy_preprocess), ('preprocess_skb', epg.preprocess_skb)):
+        elapsed = timeit(lambda: [func(page) for _ in range(n) for page in pages]) / (n * len(pages))
+        peak = max(peak_memory(func, page) for page in pages)
+        result[name] = elapsed, peak
+        print('%-16s %8.3fms/채널-날짜 %8.1f KB 최대 메모리' % (name, elapsed * 1000, peak / 1024))
+    (t0, m0), (t1, m1) = result.values()
+    print('시간 x%.2f, 메모리 x%.2f' % (t0 / t1, m0 / m1))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""소스별 벤치마크: 저장된 응답으로 GetEPGFrom*를 실행
+
+    python bench/bench_sources.py [-n 5] [--channels 10] [--save FILE] [--baseline FILE]
+
+네트워크 대신 fixtures/의 응답을 돌려주고 소스마다 요청 결과 디코딩, 파싱부터
+XML 출력까지 잰다. 소스별로 초당 프로그램 수, 채널-일자당 시간, 할당 최대량,
+출력 크기를 보여준다.
+
+--save로 결과를 저장해 두고 --baseline으로 비교하면 속도가 tolerance 이상
+느려지거나, 할당이 그만큼 늘거나, 출력이 달라진 소스가 있을 때 종료 코드 1로 끝난다.
+
+fixtures/WAVVE, fixtures/TVING에는 하루치 전체 응답이 있고 offset/limit, 시간 창,
+channelCode, 페이지는 API처럼 여기서 나눠서 돌려준다. --tving-max-hours를 주면 TVING이
+그보다 긴 시간 창을 에러 없이 앞부분만 돌려주는 경우를 흉내낸다. (프로그램 수가 같아야 함)
+"""
+import sys
+import json
+import logging
+import argparse
+import platform
+import tracemalloc
+from io import BytesIO
+from datetime import date, datetime, timedelta
+from urllib.parse import urlparse
+
+from common import load_epg2xml, load_fixtures, timeit
+
+TODAY = date(2020, 10, 20)
+PERIOD = 2
+
+# 경로: (소스, 날짜 파라미터)
+PAGES = {
+    '/tv/channel/pSchedule.asp': ('KT', 'seldate'),
+    '/css/chgi/chgi/RetrieveTvSchedule.hpi': ('LG', 'evntCmpYmd'),
+    '/content/realtime/Channel_List.do': ('SKB', 'key_depth3'),
+    '/p/csearch/content/nqapirender.nhn': ('NAVER', 'u2'),
+}
+
+
+class Replay:
+    """request_data() 대신 fixtures의 응답을 돌려준다
+
+    같은 요청의 응답 본문은 한번만 만들고 디코딩은 매번 한다 (request_data와 같게).
+    fixture가 없는 주소(채널 목록 등)는 예외를 일으켜 각 소스의 대체 경로를 타게 한다.
+    """
+    def __init__(self, tving_max_hours=0):
+        self.tving_max_hours = tving_max_hours
+        self.fixtures = {}
+        for source in ['KT', 'LG', 'SKB', 'NAVER', 'WAVVE', 'TVING']:
+            self.fixtures[source] = {day.strftime('%Y%m%d'): data for name, day, data in load_fixtures(source) if '_' not in name}
+        self.wavve = {k: json.loads(v) for k, v in self.fixtures['WAVVE'].items()}
+        self.tving = {k: json.loads(v) for k, v in self.fixtures['TVING'].items()}
+        self.bodies = {}
+
+    def __call__(self, url, params, method='GET', output='html', session=None, ret='', headers=None):
+        key = (url, tuple(sorted(params.items())))
+        if key not in self.bodies:
+            self.bodies[key] = self.body(urlparse(url).path, params)
+        body = self.bodies[key]
+        return json.loads(body) if output == 'json' else body
+
+    def body(self, path, params):
+        if path in PAGES:
+            source, param = PAGES[path]
+            return self.fixtures[source][params[param]]
+        if path == '/live/epgs':
+            return self.wavve_epgs(params)
+        if path == '/v2/media/schedules':
+            return self.tving_schedules(params)
+        raise LookupError('fixture가 없습니다: %s' % path)
+
+    def wavve_epgs(self, params):
+        start = datetime.strptime(params['startdatetime'][:10], '%Y-%m-%d').date()
+        end = datetime.strptime(params['enddatetime'][:10], '%Y-%m-%d').date()
+        channels = []
+        for k in range((end - start).days + 1):
+            day = self.wavve.get((start + timedelta(days=k)).strftime('%Y%m%d'))
+            for i, ch in enumerate(day['list'] if day else []):
+                if i < len(channels):
+                    channels[i] = dict(channels[i], list=channels[i]['list'] + ch['list'])
+                else:
+                    channels.append(ch)
+        offset, limit = int(params.get('offset', 0)), int(params.get('limit', 200))
+        page = channels[offset:offset + limit]
+        return json.dumps({'pagecount': str(len(channels)), 'count': str(len(page)), 'list': page}, ensure_ascii=False)
+
+    def tving_schedules(self, params):
+        day = self.tving.get(params['broadDate'])
+        start, end = int(params['broadDate'] + params['startBroadTime']), int(params['broadDate'] + params['endBroadTime'])
+        if self.tving_max_hours:
+            end = min(end, int(params['broadDate'] + '%02d0000' % (int(params['startBroadTime'][:2]) + self.tving_max_hours)))
+        codes = params.get('channelCode')
+        codes = set(codes.split(',')) if codes else None
+        result = []
+        for ch in (day['body']['result'] if day else []):
+            if codes is not None and ch['channel_code'] not in codes:
+                continue
+            schedules = [x for x in ch['schedules'] if x['broadcast_start_time'] < end and x['broadcast_end_time'] > start]
+            result.append(dict(ch, schedules=schedules or None))
+        page, size = int(params.get('pageNo', 1)), int(params.get('pageSize', 20))
+        body = {'result': result[(page - 1) * size:page * size], 'has_more': 'Y' if page * size < len(result) else 'N'}
+        return json.dumps({'header': {'status': 200}, 'body': body}, ensure_ascii=False)
+
+
+def channels(epg, replay, source, count):
+    """소스별 GetEPGFrom* 인자"""
+    if source == 'WAVVE':
+        return [{'Id': 1000 + i, 'Source': source, 'ServiceId': x['channelid']} for i, x in enumerate(replay.wavve[TODAY.strftime('%Y%m%d')]['list'])]
+    if source == 'TVING':
+        return [{'Id': 2000 + i, 'Source': source, 'ServiceId': x['channel_code']} for i, x in enumerate(replay.tving[TODAY.strftime('%Y%m%d')]['body']['result'])]
+    return [[i + 1, '%s %d' % (source, i + 1), source, str(i + 1)] for i in range(count)]
+
+
+def run(epg, func, infos):
+    """캐시를 비우고 한번 실행해서 XML 출력을 돌려준다"""
+    for cached in [epg.escape, epg.parse_title, epg.parse_part]:
+        cached.cache_clear()
+    epg.xmlout = BytesIO()
+    func(infos)
+    return epg.xmlout.getvalue()
+
+
+def measure(epg, func, infos, repeat):
+    output = run(epg, func, infos)
+    elapsed = timeit(run, epg, func, infos, repeat=repeat)
+    tracemalloc.start()
+    run(epg, func, infos)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    programmes = output.count(b'<programme ')
+    return {
+        'programmes': programmes,
+        'channel_days': len(infos) * PERIOD,
+        'seconds': elapsed,
+        'programmes_per_sec': programmes / elapsed,
+        'ms_per_channel_day': elapsed * 1000 / (len(infos) * PERIOD),
+        'alloc_peak_kb': peak / 1024,
+        'output_bytes': len(output),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """baseline보다 나빠진 항목을 [(소스, 설명)]으로 돌려준다"""
+    regressions = []
+    for source, base in baseline['sources'].items():
+        cur = results.get(source)
+        if cur is None:
+            regressions.append((source, '결과가 없습니다'))
+            continue
+        if (cur['programmes'], cur['output_bytes']) != (base['programmes'], base['output_bytes']):
+            regressions.append((source, '출력이 다릅니다: %d개 %d bytes (baseline %d개 %d bytes)' % (cur['programmes'], cur['output_bytes'], base['programmes'], base['output_bytes'])))
+        if cur['programmes_per_sec'] < base['programmes_per_sec'] * (1 - tolerance):
+            regressions.append((source, '느려졌습니다: %.0f programmes/s (baseline %.0f)' % (cur['programmes_per_sec'], base['programmes_per_sec'])))
+        if cur['alloc_peak_kb'] > base['alloc_peak_kb'] * (1 + tolerance):
+            regressions.append((source, '할당이 늘었습니다: %.0f KB (baseline %.0f KB)' % (cur['alloc_peak_kb'], base['alloc_peak_kb'])))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=5, help='반복 횟수 (가장 빠른 값을 쓴다)')
+    parser.add_argument('--channels', type=int, default=10, help='KT, LG, SKB, NAVER 채널 수')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--sources', default='KT,LG,SKB,NAVER,WAVVE,TVING')
+    parser.add_argument('--save', metavar='FILE', help='결과를 baseline으로 저장')
+    parser.add_argument('--baseline', metavar='FILE', help='저장된 baseline과 비교')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='허용하는 속도 저하/할당 증가 비율 (기본 0.2)')
+    parser.add_argument('--tving-max-hours', type=int, default=0, help='TVING 시간 창을 이 시간까지만 돌려줌 (0이면 자르지 않음)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='epg2xml 로그 출력 (채널 목록 요청 실패는 정상)')
+    args = parser.parse_args()
+
+    replay = Replay(args.tving_max_hours)
+    epg = load_epg2xml(today=TODAY, period=PERIOD, workers=args.workers, state=None, wavve_more_details=False,
+                       addverbose='y', addepisode='y', addrebroadcast='y', addxmltvns='n',
+                       request_data=replay, dump_channels=lambda name, channels: None)
+    epg.log.setLevel(logging.ERROR if args.verbose else logging.CRITICAL)
+    funcs = {
+        'KT': epg.GetEPGFromKT, 'LG': epg.GetEPGFromLG, 'SKB': epg.GetEPGFromSKB,
+        'NAVER': epg.GetEPGFromNaver, 'WAVVE': epg.GetEPGFromWAVVE, 'TVING': epg.GetEPGFromTVING,
+    }
+
+    results = {}
+    print('%-6s %8s %12s %12s %10s %12s' % ('소스', '프로그램', 'programmes/s', 'ms/채널-일', '할당 KB', '출력 bytes'))
+    for source in args.sources.split(','):
+        result = measure(epg, funcs[source], channels(epg, replay, source, args.channels), args.n)
+        results[source] = result
+        print('%-6s %8d %12.0f %12.3f %10.0f %12d' % (source, result['programmes'], result['programmes_per_sec'],
+                                                     result['ms_per_channel_day'], result['alloc_peak_kb'], result['output_bytes']))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'htmlparser': epg.htmlparser, 'sources': results}, f, indent=2)
+        print('저장했습니다: %s' % args.save)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for source, message in regressions:
+            print('REGRESSION %s: %s' % (source, message))
+        if regressions:
+            return 1
+        print('baseline과 비교: 이상 없음')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""시작 시간 벤치마크: python -X importtime으로 잰 import 시간
+
+    python bench/bench_startup.py [-n 5]
+
+새 프로세스에서 아래를 import하는 데 걸린 시간(최상위 import의 cumulative 합)을
+빈 인터프리터와의 차이로 잰다. 가장 빠른 값을 쓴다.
+
+    epg2xml          import만 (다른 프로그램에 넣을 때)
+    epg2xml.cli      main()이 설정을 읽기 전까지 (WAVVE, TVING만 쓸 때)
+    + bs4, lxml      KT, LG, SKB, NAVER를 쓸 때 더 불러오는 것
+    + requests       첫 요청 때 불러오는 것 (예전에는 모두 시작할 때 불렀음)
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+from common import ROOT
+
+CASES = [
+    ('epg2xml', 'import epg2xml'),
+    ('epg2xml.cli', 'import epg2xml.cli'),
+    ('+ bs4, lxml', 'import epg2xml.cli, bs4, lxml.html, lxml.etree'),
+    ('+ requests', 'import epg2xml.cli, bs4, lxml.html, lxml.etree, requests'),
+]
+
+
+def importtime(code):
+    """code를 실행하는 동안 최상위 import들의 cumulative 합(us)과 불러온 모듈 이름"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total, names = 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        names.add(name.strip())
+        if not name.startswith('  '):
+            total += int(cumulative)
+    return total, names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=5, help='반복 횟수 (가장 빠른 값을 쓴다)')
+    args = parser.parse_args()
+
+    base = min(importtime('pass')[0] for _ in range(args.n))
+    for label, code in CASES:
+        runs = [importtime(code) for _ in range(args.n)]
+        total = min(x[0] for x in runs) - base
+        heavy = sorted({x.split('.')[0] for x in runs[0][1]} & {'bs4', 'lxml', 'requests'})
+        print('%-14s %8.1f ms  %s' % (label, total / 1000, ', '.join(heavy) or '-'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
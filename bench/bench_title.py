@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""제목 파싱 벤치마크와 퍼즈 테스트
+
+    python bench/bench_title.py [--fuzz 20000] [--seed 0] [--length 4096]
+
+정상 제목의 처리 속도, 역추적을 유발하는 length 길이의 최악의 제목에 걸리는 시간,
+무작위 제목에 대해 parse_title()이 항상 빨리 올바른 형식을 돌려주는지 확인한다.
+하나라도 LIMIT을 넘으면 종료 코드 1로 끝난다.
+"""
+import sys
+import time
+import random
+import argparse
+
+from common import load_epg2xml, timeit
+
+LIMIT = 0.05    # 제목 하나에 허용하는 최대 시간(초)
+ALPHABET = '[]()<> \t0123456789,회재부월화선별전주방ab가나'
+SAMPLES = {
+    'LG': ['[생] 뉴스데스크 [특집] (12회) <재>', '드라마 [..', '인간극장 (1,234회)'],
+    'SKB': ['우리들의 블루스(12회)<마지막 이야기>(재)', '뉴스', '스포츠 중계<야구>'],
+    'SK': ['나혼자 산다 (123회) <특집>(재)', '영화 <기생충>', 'PD수첩(1,2회)'],
+    'WAVVE': ['런닝맨 123회(재)', '뉴스 (토) [특집]', '드라마 <12회>(재방)', '인간극장 (수)(재2)'],
+}
+
+
+def worst_cases(n):
+    """규칙마다 역추적이 많이 일어나는 제목"""
+    return {
+        'open-bracket': '[' * n,
+        'bracket-run': '[a]' * (n // 3) + '[',
+        'spaces': 'a' + ' ' * n + '!',
+        'digits': '1' * n + '!',
+        'episode-like': '(1회' * (n // 3),
+        'rerun-like': '(재' * (n // 2),
+        'angle': '<' * n + 'a',
+        'space-run': 'a' + ' ' * n + '(재) b',
+        'rerun-run': '(재' * (n // 2) + ')))b',
+        'bracket-pairs': '[' * (n // 2) + ']' * (n // 2) + 'a',
+    }
+
+
+def check(epg, source, title):
+    start = time.perf_counter()
+    result = epg.parse_title.__wrapped__(source, title)
+    elapsed = time.perf_counter() - start
+    ok = (isinstance(result, tuple) and len(result) == 4 and all(isinstance(x, str) for x in result[:3]) and isinstance(result[3], bool))
+    return ok, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fuzz', type=int, default=20000, help='퍼즈 테스트 횟수')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--length', type=int, default=4096, help='최악의 제목 길이')
+    args = parser.parse_args()
+
+    epg = load_epg2xml()
+    failed = False
+
+    # 1. 정상 제목: 같은 제목이 반복되는 일주일치 편성표를 가정
+    titles = [(source, title) for source, values in SAMPLES.items() for title in values] * 5000
+    nocache = timeit(lambda: [epg.parse_title.__wrapped__(s, t) for s, t in titles])
+    epg.parse_title.cache_clear()
+    cached = timeit(lambda: [epg.parse_title(s, t) for s, t in titles])
+    print('정상 제목 %d개: 메모 없음 %.3fs, 메모 %.3fs (x%.1f)' % (len(titles), nocache, cached, nocache / cached))
+
+    # 2. 최악의 제목: 길이에 비례하는 시간 안에 끝나야 한다
+    print('최악의 제목 (길이 %d):' % args.length)
+    for name, title in worst_cases(args.length).items():
+        worst = 0
+        for source in epg.TITLE_RULES:
+            ok, elapsed = check(epg, source, title)
+            worst = max(worst, elapsed)
+            failed |= not ok or elapsed > LIMIT
+        print('  %-14s %8.3fms' % (name, worst * 1000))
+
+    # 3. 퍼즈 테스트
+    rnd = random.Random(args.seed)
+    worst, worst_title = 0, ''
+    for _ in range(args.fuzz):
+        title = ''.join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 512)))
+        for source in epg.TITLE_RULES:
+            ok, elapsed = check(epg, source, title)
+            if not ok:
+                print('잘못된 결과: %s %r' % (source, title))
+                failed = True
+            if elapsed > worst:
+                worst, worst_title = elapsed, title
+    print('퍼즈 %d개 x %d규칙: 가장 느린 제목 %.3fms %r' % (args.fuzz, len(epg.TITLE_RULES), worst * 1000, worst_title[:40]))
+    failed |= worst > LIMIT
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""XMLTV 출력 벤치마크: 이전 print 방식 vs xmlwrite
+
+    python bench/bench_writer.py [--channels 300] [--days 7]
+"""
+import re
+import sys
+import argparse
+import tempfile
+from xml.sax.saxutils import escape as _escape, unescape
+
+from common import load_epg2xml, sample_epginfo, timeit
+
+
+def legacy_writer(epg, out):
+    """baseline의 줄 단위 print()와 정규식 escape()로 만든 writeProgram"""
+    illegal_RE = re.compile(u'[%s]' % u''.join("%s-%s" % (chr(low), chr(high)) for (low, high) in epg._illegal_unichrs))
+
+    def escape(s):
+        return _escape(illegal_RE.sub(' ', s))
+
+    def writeProgram(p):
+        programName = escape(p.programName).strip()
+        subprogramName = escape(p.subprogramName).strip()
+        matches = re.match(r'(.*) \(?(\d+부)\)?', unescape(programName))
+        if matches:
+            programName = escape(matches.group(1)).strip()
+            subprogramName = (escape(matches.group(2)) + ' ' + subprogramName).strip()
+        actors, producers, category = escape(p.actors), escape(p.producers), escape(p.category)
+        episode, rebroadcast = p.episode, p.rebroadcast
+        if episode:
+            programName = programName + ' (' + str(episode) + '회)'
+        if rebroadcast:
+            programName = programName + ' (재)'
+        rating = '전체 관람가' if p.rating == 0 else '%s세 이상 관람가' % p.rating
+        desc = programName
+        if subprogramName:
+            desc += '\n부제 : ' + subprogramName
+        if rebroadcast:
+            desc += '\n방송 : 재방송'
+        if episode:
+            desc += '\n회차 : ' + str(episode) + '회'
+        if category:
+            desc += '\n장르 : ' + category
+        if actors:
+            desc += '\n출연 : ' + actors.strip()
+        if producers:
+            desc += '\n제작 : ' + producers.strip()
+        desc += '\n등급 : ' + rating
+        if p.desc:
+            desc += '\n' + escape(p.desc)
+        desc = re.sub(' +', ' ', desc)
+        print('  <programme start="%s +0900" stop="%s +0900" channel="%s">' % (p.startTime, p.endTime, p.channelId), file=out)
+        print('    <title lang="kr">%s</title>' % programName, file=out)
+        if subprogramName:
+            print('    <sub-title lang="kr">%s</sub-title>' % subprogramName, file=out)
+        print('    <desc lang="kr">%s</desc>' % desc, file=out)
+        if actors or producers:
+            print('    <credits>', file=out)
+            for actor in actors.split(','):
+                if actor.strip():
+                    print('      <actor>%s</actor>' % actor.strip(), file=out)
+            for producer in producers.split(','):
+                if producer.strip():
+                    print('      <producer>%s</producer>' % producer.strip(), file=out)
+            print('    </credits>', file=out)
+        if category:
+            print('    <category lang="kr">%s</category>' % category, file=out)
+        if episode:
+            print('    <episode-num system="onscreen">%s</episode-num>' % episode, file=out)
+        if rebroadcast:
+            print('    <previously-shown />', file=out)
+        print('    <rating system="KMRB">', file=out)
+        print('      <value>%s</value>' % rating, file=out)
+        print('    </rating>', file=out)
+        print('  </programme>', file=out)
+    return writeProgram
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--channels', type=int, default=300)
+    parser.add_argument('--days', type=int, default=7)
+    args = parser.parse_args()
+
+    epg = load_epg2xml(addverbose='y', addepisode='y', addrebroadcast='y', addxmltvns='n')
+    data = sample_epginfo(args.channels, args.days, record=epg.Programme)
+    programs = sum(len(x) - 1 for x in data)
+
+    def run_legacy():
+        with tempfile.TemporaryFile('w', encoding='utf-8') as out:
+            epg.writeProgram = legacy_writer(epg, out)
+            for epginfo in data:
+                epg.epgzip(epginfo)
+        epg.writeProgram = writeProgram
+
+    def run_new():
+        epg.escape.cache_clear()
+        with tempfile.TemporaryFile('wb', buffering=1024 * 1024) as out:
+            epg.xmlout = out
+            for epginfo in data:
+                epg.epgzip(epginfo)
+            out.flush()
+
+    writeProgram = epg.writeProgram
+    legacy = timeit(run_legacy)
+    new = timeit(run_new)
+    print('%d채널 x %d일 = %d개 프로그램' % (args.channels, args.days, programs))
+    print('%-8s %8.3fs %10.0f programmes/s' % ('print', legacy, programs / legacy))
+    print('%-8s %8.3fs %10.0f programmes/s  (x%.2f)' % ('xmlwrite', new, programs / new, legacy / new))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
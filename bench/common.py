@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""벤치마크 공용 함수"""
+import os
+import sys
+import time
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_epg2xml(**conf):
+    """epg2xml.core를 불러온다
+
+    conf로 넘긴 값은 모듈 변수로 들어간다. (예: addverbose='y', period=7)
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from epg2xml import core
+    core.__dict__.update(conf)
+    return core
+
+
+def sample_epginfo(channels=300, days=7, per_day=30, seed=0, record=lambda *fields: list(fields)):
+    """채널별 epginfo 목록을 만든다 (같은 제목이 여러번 반복되는 실제 편성표와 비슷하게)
+
+    프로그램 하나는 record(ChannelId, startTime, programName, ...)로 만든다.
+    """
+    rnd = random.Random(seed)
+    titles = ['뉴스 %d' % i for i in range(50)] + ['드라마 <%d> & 스페셜' % i for i in range(150)] + ['예능 %d (%d부)' % (i, i % 3 + 1) for i in range(100)]
+    categories = ['뉴스', '드라마', '예능', '교양', '스포츠', '영화', '']
+    actors = ['', '홍길동,김철수', '이영희,박민수,최지우']
+    result = []
+    for ch in range(channels):
+        epginfo = []
+        for d in range(days):
+            for n in range(per_day):
+                minute = n * (1440 // per_day)
+                startTime = '202010%02d%02d%02d00' % (d + 1, minute // 60, minute % 60)
+                epginfo.append(record(ch + 1, startTime, rnd.choice(titles), rnd.choice(['', '부제\x0b있음']), rnd.choice(['', '줄거리 <설명>']),
+                                rnd.choice(actors), rnd.choice(['', '감독']), rnd.choice(categories), str(rnd.randint(0, 30) or ''), rnd.random() < 0.3, rnd.choice([0, 12, 15, 19])))
+        result.append(epginfo)
+    return result
+
+
+def timeit(func, *args, repeat=3):
+    """repeat번 실행해서 가장 빠른 시간(초)을 돌려준다"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixtures(source):
+    """fixtures/<source>/YYYYMMDD*.{html,json} 파일을 [(파일명, 날짜, 내용)]으로 읽는다"""
+    from datetime import datetime
+    result = []
+    path = os.path.join(FIXTURES, source)
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), 'r', encoding='utf-8') as f:
+            data = f.read()
+        result.append((name, datetime.strptime(name[:8], '%Y%m%d').date(), data))
+    return result
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""EPG 정보를 XML로 만드는 프로그램
+
+    python epg2xml.py [옵션]  또는  python -m epg2xml [옵션]
+
+다른 프로그램에서는 main(argv) 또는 generate(config)를 쓴다.
+import할 때는 아무것도 실행하지 않고 필요한 모듈도 쓸 때 불러온다.
+"""
+__version__ = '1.5.0'
+
+
+def main(argv=None):
+    """명령행과 같이 실행하고 종료 코드를 돌려준다"""
+    from epg2xml.cli import main
+    return main(argv)
+
+
+def generate(config):
+    """config(epg2xml.json과 같은 키의 dict)대로 EPG를 가져와 Programme을 하나씩 돌려준다
+
+    잘못된 설정이면 처음 받을 때 ValueError(epg2xml.core.ConfigError)를 일으킨다. 한번에 하나만 실행할 수 있다.
+    """
+    from epg2xml.cli import generate
+    return generate(config)
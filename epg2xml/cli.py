@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""명령행 인자와 설정 파일을 읽어 core의 설정값을 정하고 실행한다"""
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from importlib.util import find_spec
+from logging.handlers import RotatingFileHandler
+
+from epg2xml import __version__, core
+from epg2xml.core import log, ConfigError
+
+# importtant files
+__dirpath__ = core.__dirpath__
+logfile = os.path.join(__dirpath__, 'epg2xml.py.log')
+cachefile = os.path.join(__dirpath__, 'epg2xml.cache')
+detailcachefile = os.path.join(__dirpath__, 'epg2xml.wavve.cache')
+statefile = os.path.join(__dirpath__, 'epg2xml.state.json')
+catalogfile = os.path.join(__dirpath__, 'epg2xml.catalog.json')
+configfile = os.path.join(__dirpath__, 'epg2xml.json')
+channelfile = os.path.join(__dirpath__, 'Channel.json')
+
+# default config
+CONF = {
+    'MyISP': 'ALL',
+    'MyChannels': '',
+    'output': 'd',
+    'default_xml_file': 'xmltv.xml',
+    'default_xml_socket': 'xmltv.sock',
+    'default_icon_url': '',
+    'default_fetch_limit': '2',
+    'default_rebroadcast': 'y',
+    'default_episode': 'y',
+    'default_verbose': 'n',
+    'default_xmltvns': 'n',
+    'WAVVE_more_details': 'n',
+    'WAVVE_detail_cache_hours': '168',
+    'WAVVE_detail_cache_size': '50000',
+    'default_parallel': 'n',
+    'default_workers': '4',
+    'parse_workers': '0',
+    'cache_ttl': {},
+    'cache_size_mb': '100',
+    'default_incremental': 'n',
+    'default_compress': '',
+    'default_compress_level': '',
+    'fragment_dir': '',
+    'incremental_hours': '6',
+    'catalog_ttl': {},
+    'dead_channel_hours': '24',
+    'host_limits': {},
+    'metrics_file': '',
+    'metrics_prom_file': '',
+}
+
+# 설정 파일로 바꿀 수 있는 core의 호스트별, 소스별 기본값 (configure()마다 여기서 다시 시작)
+DEFAULTS = {name: dict(getattr(core, name)) for name in ['host_limits', 'cache_ttl', 'catalog_ttl']}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='EPG 정보를 XML로 만드는 프로그램', epilog='여러 XMLTV 파일 합치기: %(prog)s merge -h')
+    parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__)
+    parser.add_argument('--config', dest='configfile', default=configfile, help='설정 파일 경로 (기본값: %s)' % configfile)
+    parser.add_argument('--logfile', default=logfile, help='로그 파일 경로 (기본값: %s)' % logfile)
+    parser.add_argument('--loglevel', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO', help='로그 레벨 (기본값: INFO)')
+    parser.add_argument('--channelfile', default=channelfile, help='채널 파일 경로 (기본값: %s)' % channelfile)
+    parser.add_argument('--cachefile', default=cachefile, help='응답 캐시 파일 경로 (기본값: %s)' % cachefile)
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', help='응답 캐시를 사용하지 않음')
+    parser.add_argument('--detail-cachefile', default=detailcachefile, help='WAVVE 상세 정보 캐시 파일 경로 (기본값: %s)' % detailcachefile)
+    parser.add_argument('--statefile', default=statefile, help='증분 갱신 상태 파일 경로 (기본값: %s)' % statefile)
+    parser.add_argument('--catalogfile', default=catalogfile, help='채널 목록 파일 경로 (기본값: %s)' % catalogfile)
+    parser.add_argument('--incremental', dest='default_incremental', action='store_const', const='y', help='오래되었거나 없는 (채널, 날짜)만 새로 가져옴')
+    parser.add_argument('--metrics', dest='metrics_file', metavar='FILE', help='실행 통계를 JSON 파일로 저장')
+    parser.add_argument('--metrics-prom', dest='metrics_prom_file', metavar='FILE', help='실행 통계를 Prometheus textfile(.prom)로 저장')
+    arg2 = parser.add_mutually_exclusive_group()
+    arg2.add_argument('--record', metavar='DIR', help='모든 요청과 응답을 DIR에 기록')
+    arg2.add_argument('--replay', metavar='DIR', help='네트워크 대신 DIR에 기록된 응답을 사용')
+    parser.add_argument('-i', '--isp', dest='MyISP', choices=['ALL', 'KT', 'LG', 'SK', 'SKB'], help='사용하는 ISP 선택')
+    parser.add_argument('-c', '--channelid', dest='MyChannels', metavar='CHANNELID', help='채널 ID를 ,와 -, *를 적절히 조합하여 지정 (예: -3,5,7-9,11-)')
+    parser.add_argument('-w', '--workers', dest='default_workers', metavar='WORKERS', help='소스별로 동시에 요청하는 (채널, 날짜) 수')
+    parser.add_argument('--parse-workers', dest='parse_workers', metavar='WORKERS', help='KT, LG, SKB, NAVER 편성표를 파싱하는 프로세스 수 (0이면 요청하는 스레드에서 파싱)')
+    parser.add_argument('-p', '--parallel', dest='default_parallel', action='store_const', const='y', help='모든 소스에서 동시에 EPG를 가져옴')
+    parser.add_argument('--compress', dest='default_compress', metavar='gz,xz', help='XML 파일을 압축해서 함께 저장 (gz, xz 또는 gz,xz)')
+    parser.add_argument('--fragment-dir', dest='fragment_dir', metavar='DIR', help='채널별 XML 조각을 DIR에 저장하고 DIR의 조각을 모두 합쳐서 출력')
+    parser.add_argument('--compress-level', dest='default_compress_level', metavar='LEVEL', help='압축 레벨 0-9 (기본값: gz 6, xz 6)')
+    arg1 = parser.add_mutually_exclusive_group()
+    arg1.add_argument('-d', '--display', dest='output', action='store_const', const='d', help='생성된 EPG를 화면에 출력')
+    arg1.add_argument('-o', '--outfile', dest='default_xml_file', metavar='XMLTVFILE', nargs='?', const='xmltv.xml', help='생성된 EPG를 파일로 저장, .gz/.xz로 끝나면 압축 (기본경로: %s)' % 'xmltv.xml')
+    arg1.add_argument('-s', '--socket', dest='default_xml_socket', metavar='XMLTVSOCK', nargs='?', const='xmltv.sock', help='생성된 EPG를 소켓으로 전송 (기본경로: %s)' % 'xmltv.sock')
+    args = vars(parser.parse_args(argv))
+    if args['default_xml_file']:
+        args['output'] = 'o'
+    elif args['default_xml_socket']:
+        args['output'] = 's'
+    return args
+
+
+def setup_logging(logfile, loglevel):
+    log_fmt = "%(asctime)-15s %(levelname)-8s %(lineno)03d %(message)s"
+    formatter = logging.Formatter(log_fmt, datefmt='%Y/%m/%d %H:%M:%S')
+
+    # logging to file
+    filehandler = RotatingFileHandler(logfile, maxBytes=1024 * 1000, backupCount=5, encoding='utf-8')
+    filehandler.setFormatter(formatter)
+    log.addHandler(filehandler)
+
+    # logging to console, stderr by default
+    consolehandler = logging.StreamHandler()
+    consolehandler.setFormatter(formatter)
+    log.addHandler(consolehandler)
+
+    log.setLevel(getattr(logging, loglevel))
+
+
+def check_modules():
+    """third-party 모듈이 설치되어 있는지 import하지 않고 확인한다 (import는 처음 쓸 때). 실행할 수 없으면 False"""
+    if not find_spec('bs4'):
+        log.error("BeautifulSoup 모듈이 설치되지 않았습니다.")
+        return False
+    if core.htmlparser != 'lxml':
+        log.warning("lxml 모듈이 설치되지 않아 html.parser로 동작합니다. 속도가 느립니다.")
+    if not find_spec('requests'):
+        log.error("requests 모듈이 설치되지 않았습니다.")
+        return False
+
+    if list(sys.version_info[:2]) < [3, 5]:
+        log.error("python 3.5+에서 실행하세요.")
+        return False
+    return True
+
+
+def load_conf(args, json_conf):
+    """명령행 인자, 설정 파일, 기본값 순서로 설정을 정한다"""
+    conf = dict(CONF)
+    for k in conf:
+        if k in args and args[k]:
+            conf[k] = args[k]
+            log.debug('%s=%s by %s', k, args[k], 'cmd')
+        elif k in json_conf and json_conf[k]:
+            conf[k] = json_conf[k]
+            log.debug('%s=%s by %s', k, json_conf[k], 'configfile')
+        else:
+            log.debug('%s=%s by %s', k, conf[k], 'default')
+    return conf
+
+
+def configure(conf, args, channels):
+    """설정을 검사해서 core의 설정값을 정하고 캐시 파일 등을 연다
+
+    잘못된 설정이면 ConfigError를 일으킨다. 설정값은 core의 모듈 변수에 들어가므로
+    한 프로세스에서 한번에 하나만 실행할 수 있다. 전에 실행한 설정은 남지 않는다.
+    """
+    for name, value in DEFAULTS.items():
+        setattr(core, name, dict(value))
+    core._limiters.clear()
+    core.now = datetime.now()
+    core.today = core.now.date()
+    core.metrics = core.RunMetrics()
+
+    core.MyISP = conf['MyISP']
+    if not any(core.MyISP in s for s in ['ALL', 'KT', 'LG', 'SK', 'SKB']):
+        raise ConfigError("MyISP는 ALL, KT, LG, SK, SKB만 가능합니다.")
+
+    core.registry = core.ChannelRegistry(channels)
+    try:
+        core.registry.select(conf['MyChannels'])
+    except ValueError:
+        raise ConfigError('MyChannels 범위에 문제가 있습니다: %s' % conf['MyChannels'])
+
+    if not any(conf['output'] in s for s in ['d', 'o', 's']):
+        raise ConfigError("output은 d, o, s만 가능합니다.")
+    compress = [x.strip() for x in conf['default_compress'].split(',') if x.strip()]
+    if any(x not in ['gz', 'xz'] for x in compress):
+        raise ConfigError("default_compress는 gz, xz 또는 gz,xz만 가능합니다.")
+    if conf['default_compress_level'] and not (str(conf['default_compress_level']).isdigit() and int(conf['default_compress_level']) <= 9):
+        raise ConfigError("default_compress_level은 0-9만 가능합니다.")
+    compress_level = int(conf['default_compress_level']) if conf['default_compress_level'] else None
+    if compress and conf['output'] != 'o':
+        log.warning("압축은 파일로 저장할 때만 사용됩니다.")
+    if conf['output'] == 'o':
+        xmlfiles = [conf['default_xml_file']] + [conf['default_xml_file'] + '.' + x for x in compress]
+        xmlout = [core.open_xmlfile(x, compress_level) for x in xmlfiles]
+        core.xmlout = xmlout[0] if len(xmlout) == 1 else core.TeeWriter(xmlout)
+    elif conf['output'] == 's':
+        import socket
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(conf['default_xml_socket'])
+            core.xmlout = sock.makefile('wb', buffering=1024 * 1024)
+        except socket.error:
+            raise ConfigError('xmltv.sock 파일을 찾을 수 없습니다.')
+    else:
+        core.xmlout = sys.stdout.buffer
+
+    core.fragments = None
+    if conf['fragment_dir']:
+        try:
+            core.fragments = core.FragmentStore(conf['fragment_dir'])
+        except OSError as e:
+            raise ConfigError('fragment_dir을 만들 수 없습니다: %s' % str(e))
+
+    core.IconUrl = conf['default_icon_url']
+
+    if not any(conf['default_rebroadcast'] in s for s in 'yn'):
+        raise ConfigError("default_rebroadcast는 y, n만 가능합니다.")
+    else:
+        core.addrebroadcast = conf['default_rebroadcast']
+
+    if not any(conf['default_episode'] in s for s in 'yn'):
+        raise ConfigError("default_episode는 y, n만 가능합니다.")
+    else:
+        core.addepisode = conf['default_episode']
+
+    if not any(conf['default_verbose'] in s for s in 'yn'):
+        raise ConfigError("default_verbose는 y, n만 가능합니다.")
+    else:
+        core.addverbose = conf['default_verbose']
+
+    if not any(conf['default_xmltvns'] in s for s in 'yn'):
+        raise ConfigError("default_xmltvns는 y, n만 가능합니다.")
+    else:
+        core.addxmltvns = conf['default_xmltvns']
+
+    if not any(conf['default_fetch_limit'] in s for s in '1234567'):
+        raise ConfigError("default_fetch_limit은 1-7만 가능합니다.")
+    else:
+        core.period = int(conf['default_fetch_limit'])
+
+    if not any(conf['WAVVE_more_details'] in s for s in 'yn'):
+        raise ConfigError("WAVVE_more_details는 y, n만 가능합니다.")
+    else:
+        core.wavve_more_details = conf['WAVVE_more_details'] == 'y'
+
+    if not str(conf['WAVVE_detail_cache_hours']).isdigit() or not str(conf['WAVVE_detail_cache_size']).isdigit():
+        raise ConfigError("WAVVE_detail_cache_hours, WAVVE_detail_cache_size는 숫자만 가능합니다.")
+    core.detailcache = None
+    if core.wavve_more_details and int(conf['WAVVE_detail_cache_hours']) > 0 and int(conf['WAVVE_detail_cache_size']) > 0:
+        try:
+            core.detailcache = core.DetailCache(args['detail_cachefile'], int(conf['WAVVE_detail_cache_hours']) * 3600, int(conf['WAVVE_detail_cache_size']))
+        except sqlite3.Error as e:
+            log.warning("WAVVE 상세 정보 캐시 파일을 열 수 없어 캐시 없이 동작합니다: %s", str(e))
+
+    if not any(conf['default_parallel'] in s for s in 'yn'):
+        raise ConfigError("default_parallel은 y, n만 가능합니다.")
+    else:
+        core.parallel = conf['default_parallel'] == 'y'
+
+    for host, ttl in conf['cache_ttl'].items():
+        if not isinstance(ttl, int) or ttl < 0:
+            raise ConfigError("cache_ttl은 {\"호스트\": 초} 형식이어야 합니다: %s" % host)
+        core.cache_ttl[host] = ttl
+
+    if not str(conf['cache_size_mb']).isdigit():
+        raise ConfigError("cache_size_mb는 숫자만 가능합니다.")
+    core.cache = None
+    if not args['no_cache'] and int(conf['cache_size_mb']) > 0:
+        try:
+            core.cache = core.ResponseCache(args['cachefile'], int(conf['cache_size_mb']) * 1024 * 1024)
+        except sqlite3.Error as e:
+            log.warning("캐시 파일을 열 수 없어 캐시 없이 동작합니다: %s", str(e))
+
+    if not any(conf['default_incremental'] in s for s in 'yn'):
+        raise ConfigError("default_incremental은 y, n만 가능합니다.")
+    if not str(conf['incremental_hours']).isdigit():
+        raise ConfigError("incremental_hours는 숫자만 가능합니다.")
+    core.archive = None
+    if args['record'] or args['replay']:
+        try:
+            core.archive = core.RequestArchive(args['record'] or args['replay'], replay=bool(args['replay']))
+        except (OSError, sqlite3.Error) as e:
+            raise ConfigError("요청 기록 파일을 열 수 없습니다: %s" % str(e))
+        if core.archive.replay:
+            # 기록할 때와 같은 날짜로 요청해야 기록된 응답과 맞음
+            core.now, core.today = core.archive.now, core.archive.now.date()
+            log.info('%s에 기록된 요청 %d개로 실행합니다.', core.archive.now.strftime('%Y/%m/%d %H:%M:%S'), core.archive.count)
+
+    core.state = None
+    if conf['default_incremental'] == 'y':
+        core.state = core.EpgState(args['statefile'], int(conf['incremental_hours']) * 3600)
+
+    for source, ttl in conf['catalog_ttl'].items():
+        if not isinstance(ttl, int) or ttl < 0:
+            raise ConfigError("catalog_ttl은 {\"소스\": 초} 형식이어야 합니다: %s" % source)
+        core.catalog_ttl[source] = ttl
+    if not str(conf['dead_channel_hours']).isdigit():
+        raise ConfigError("dead_channel_hours는 숫자만 가능합니다.")
+    if core.archive is None:
+        core.catalog = core.ChannelCatalog(args['catalogfile'], int(conf['dead_channel_hours']) * 3600)
+    else:
+        core.catalog = core.ChannelCatalog(None, 0)
+
+    if not str(conf['default_workers']).isdigit() or not 1 <= int(conf['default_workers']) <= 32:
+        raise ConfigError("default_workers는 1-32만 가능합니다.")
+    else:
+        core.workers = int(conf['default_workers'])
+
+    if not str(conf['parse_workers']).isdigit() or not 0 <= int(conf['parse_workers']) <= 32:
+        raise ConfigError("parse_workers는 0-32만 가능합니다.")
+    elif int(conf['parse_workers']):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # 요청 스레드가 도는 중에 fork하지 않도록 spawn으로 띄운다
+        core.parse_pool = ProcessPoolExecutor(int(conf['parse_workers']), mp_context=multiprocessing.get_context('spawn'))
+
+    for host, limit in conf['host_limits'].items():
+        try:
+            rate, burst = float(limit[0]), int(limit[1])
+            if rate <= 0 or burst < 1:
+                raise ValueError
+        except (TypeError, ValueError, IndexError):
+            raise ConfigError("host_limits는 {\"호스트\": [초당 요청수, burst]} 형식이어야 합니다: %s" % host)
+        core.host_limits[host] = (rate, burst)
+
+    core.metrics_file = conf['metrics_file']
+    core.metrics_prom_file = conf['metrics_prom_file']
+
+
+def close():
+    """configure()에서 연 파일과 파싱 프로세스를 닫는다"""
+    if core.cache is not None:
+        core.cache.close()
+    if core.detailcache is not None:
+        core.detailcache.close()
+    if core.archive is not None:
+        if not core.archive.replay:
+            log.info('요청 %d개를 기록했습니다: %s', core.archive.count, core.archive.path)
+        core.archive.close()
+    if core.parse_pool is not None:
+        core.parse_pool.shutdown()
+    core.cache = core.detailcache = core.archive = core.parse_pool = None
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['merge']:
+        from epg2xml import merge
+        return merge.main(argv[1:])
+    args = parse_args(argv)
+    setup_logging(args['logfile'], args['loglevel'])
+    if not check_modules():
+        return 1
+
+    try:
+        channels = core.load_json(args['channelfile'])
+        json_conf = core.load_json(args['configfile'])
+
+        log.debug('설정을 읽어오는 중 ...')
+        configure(load_conf(args, json_conf), args, channels)
+        core.getEpg()
+    except ConfigError as e:
+        log.error(str(e))
+        return 1
+    finally:
+        close()
+    return 0
+
+
+def generate(config):
+    """config대로 EPG를 가져와 Programme을 하나씩 돌려준다
+
+    config는 epg2xml.json과 같은 키를 쓰고, 파일 경로는 명령행 인자의 이름
+    (channelfile, cachefile, statefile, ...)으로 준다. Channel.json 내용을 'channels'로
+    직접 넘길 수도 있다. XML은 만들지 않으며 소스는 차례대로 실행한다.
+    잘못된 설정이면 처음 Programme을 받을 때 ConfigError(ValueError)를 일으킨다. 설정은 core의 모듈 변수에
+    들어가므로 동시에 여러 개를 실행할 수 없다. (하나가 끝난 뒤 다음을 실행)
+    """
+    args = parse_args([])
+    args.update((k, v) for k, v in config.items() if k in args)
+    conf = load_conf(args, config)
+    conf['output'] = 'd'
+    conf['fragment_dir'] = ''
+    channels = config['channels'] if 'channels' in config else core.load_json(args['channelfile'])
+    try:
+        configure(conf, args, channels)
+        yield from core.generate()
+    finally:
+        close()
@@ -0,0 +1,2278 @@
+# -*- coding: utf-8 -*-
+"""소스별로 EPG를 가져와 XMLTV로 쓰는 부분
+
+설정값은 모듈 변수이며 cli.configure()가 정한다. bs4, lxml, requests처럼
+import가 오래 걸리는 모듈은 처음 쓸 때 불러온다.
+"""
+import io
+import os
+import re
+import sys
+import gzip
+import lzma
+import zlib
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import importlib
+import threading
+from io import BytesIO
+from bisect import bisect_right
+from itertools import islice
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.util import find_spec
+from urllib.parse import quote, unquote, urlparse
+from datetime import datetime, timedelta
+
+from epg2xml import __version__
+
+#
+# default variables
+#
+now = datetime.now()    # --replay에서는 기록한 시각으로 바뀜
+today = now.date()
+ua = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/77.0.3865.90 Safari/537.36'
+req_timeout = 15
+req_sleep = 1   # host_limits에 없는 호스트의 요청 간격
+
+# 호스트별 [초당 요청수, burst]
+host_limits = {
+    'tv.kt.com': (1, 2),
+    'www.uplus.co.kr': (1, 2),
+    'm.skbroadband.com': (1, 2),
+    'm.search.naver.com': (1, 2),
+    'apis.pooq.co.kr': (2, 4),
+    'api.tving.com': (2, 4),
+}
+
+# 호스트별 응답 캐시 유지 시간 (초), 없는 호스트는 캐시하지 않음
+cache_ttl = {
+    'tv.kt.com': 3600,
+    'www.uplus.co.kr': 3600,
+    'm.skbroadband.com': 3600,
+    'm.search.naver.com': 3600,
+    'apis.pooq.co.kr': 1800,
+    'api.tving.com': 1800,
+}
+
+# 소스별 채널 목록 유지 시간 (초), 없는 소스는 매번 새로 가져옴
+# WAVVE는 채널 목록이 편성표 응답에 같이 오므로 해당 없음
+catalog_ttl = {
+    'KT': 86400,
+    'SKB': 86400,
+    'TVING': 86400,
+}
+
+# Channel_<소스>.json 등을 두는 곳 (epg2xml.py가 있는 폴더)
+__dirpath__ = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# 설정값, cli.configure()에서 바뀜
+MyISP = 'ALL'
+registry = None
+IconUrl = ''
+addrebroadcast = 'y'
+addepisode = 'y'
+addverbose = 'n'
+addxmltvns = 'n'
+period = 2
+wavve_more_details = False
+parallel = False
+workers = 4
+parse_pool = None
+cache = None
+detailcache = None
+archive = None
+state = None
+metrics_file = ''
+metrics_prom_file = ''
+
+log = logging.getLogger('epg2xml')
+
+
+#
+# import third-parties
+#
+class LazyModule:
+    """속성을 처음 쓸 때 import하는 모듈
+
+    bs4, lxml은 KT, LG, SKB, NAVER를 가져올 때만 필요하고 requests도 import가
+    오래 걸리므로 시작할 때 불러오지 않는다.
+    """
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name)
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+
+bs4 = LazyModule('bs4')
+lxml_html = LazyModule('lxml.html')
+lxml_etree = LazyModule('lxml.etree')
+requests = LazyModule('requests')
+try:
+    htmlparser = 'lxml' if find_spec('lxml') else 'html.parser'
+except ImportError:
+    htmlparser = 'html.parser'
+
+
+# Get epg data
+def getEpg():
+    channels, sources = get_sources()
+    if fragments is None:
+        xmlwrite(xml_header())
+    for channel in channels:
+        writeChannel(*channel)
+
+    # Print Program Information
+    if parallel:
+        # 소스별로 버퍼에 받아두었다가 원래 순서대로 출력
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = [executor.submit(buffered, run_source, func, infos) for func, infos in sources]
+            for future in futures:
+                xmlout.write(future.result())
+    else:
+        for func, infos in sources:
+            run_source(func, infos)
+    save_state()
+
+    if fragments is not None:
+        # EPG가 없는 채널도 <channel> 조각은 남긴다
+        fragments.commit_all()
+        fragments.prune(registry.ids())
+        xmlwrite(xml_header())
+        fragments.assemble(xmlout)
+    xmlwrite('</tv>\n')
+    if xmlout is sys.stdout.buffer:
+        xmlout.flush()
+    else:
+        xmlout.close()
+    log.info('종료합니다.')
+
+
+def generate():
+    """getEpg()와 같이 가져오되 XML 대신 Programme을 소스 순서대로 하나씩 돌려준다"""
+    _, sources = get_sources()
+    for func, infos in sources:
+        _xmlout.sink = programmes = []
+        try:
+            run_source(func, infos)
+        finally:
+            _xmlout.sink = None
+        yield from programmes
+    save_state()
+
+
+def get_sources():
+    """MyChannels로 고른 채널의 [(ChannelId, ChannelNames, ChannelIconUrl)]와 [(GetEPGFrom*, 채널 목록)]"""
+    channels = []
+    ChannelInfos = {source: [] for source in ['KT', 'LG', 'SK', 'SKB', 'NAVER']}
+    # 소스별로 나눠둔 목록에서 고른 채널만 꺼내 Channel.json 순서로 출력한다
+    selected = sorted((x for source in ChannelInfos for x in registry.batch(source) if registry.selected(x)), key=registry.position)
+    for Channeldata in selected:     # Get Channel & Print Channel info
+        ChannelId = Channeldata['Id']
+        ChannelName = escape(Channeldata['Name'])
+        ChannelSource = Channeldata['Source']
+        ChannelServiceId = Channeldata['ServiceId']
+        ChannelIconUrl = escape(Channeldata['Icon_url'])
+        ChannelInfos[ChannelSource].append([ChannelId, ChannelName, ChannelSource, ChannelServiceId])
+        ChannelNames = []
+        if MyISP != "ALL" and Channeldata[MyISP+'Ch'] is not None:
+            ChannelNumber = str(Channeldata[MyISP+'Ch'])
+            ChannelISPName = escape(Channeldata[MyISP+' Name'])
+            ChannelNames = [ChannelName, ChannelISPName, ChannelNumber, ChannelNumber+' '+ChannelISPName]
+        elif MyISP == "ALL":
+            ChannelNames = [ChannelName]
+        if IconUrl:
+            ChannelIconUrl = '%s/%s.png' % (IconUrl, ChannelId)
+        channels.append((ChannelId, ChannelNames, ChannelIconUrl))
+
+    sources = [
+        (GetEPGFromKT, ChannelInfos['KT']),
+        (GetEPGFromLG, ChannelInfos['LG']),
+        (GetEPGFromSK, ChannelInfos['SK']),
+        (GetEPGFromSKB, ChannelInfos['SKB']),
+        (GetEPGFromNaver, ChannelInfos['NAVER']),
+        # 여기서부터는 기존의 채널 필터(My Channel)를 사용하지 않음
+        (GetEPGFromWAVVE, registry.batch('WAVVE')),
+        (GetEPGFromTVING, registry.batch('TVING')),
+    ]
+    return channels, sources
+
+
+def save_state():
+    if state is not None:
+        state.save()
+    catalog.save()
+    metrics.save(metrics_file, metrics_prom_file)
+
+
+def run_source(func, infos):
+    """GetEPGFrom*를 실행하고 걸린 시간과 출력한 프로그램 수를 metrics에 더한다"""
+    if not infos:
+        return
+    _xmlout.programmes = 0
+    _xmlout.fragment = ''
+    start = time.perf_counter()
+    try:
+        func(infos)
+        if fragments is not None and _xmlout.fragment:
+            fragments.commit(_xmlout.fragment)
+    finally:
+        _xmlout.fragment = None
+        metrics.add(func.__name__[len('GetEPGFrom'):].upper(), seconds=time.perf_counter() - start, programmes=_xmlout.programmes)
+
+
+def GetEPGFromKT(ChannelInfos):
+    if ChannelInfos:
+        log.info('소스가 KT인 채널을 가져오고 있습니다.')
+    else:
+        return
+
+    url = 'https://tv.kt.com/tv/channel/pSchedule.asp'
+    referer = 'https://tv.kt.com/'
+    params = {
+        'ch_type': '1',             # 1: live 2: skylife 3: uhd live 4: uhd skylife
+        'view_type': '1',           # 1: daily 2: weekly
+        'service_ch_no': 'SVCID',
+        'seldate': 'EPGDATE',
+    }
+
+    sess = requests.session()
+    sess.headers.update({'User-Agent': ua, 'Referer': referer})
+
+    # check all available channels
+    def fetch_channels():
+        url_ch = 'https://tv.kt.com/tv/channel/pChList.asp'
+        params_ch = {"ch_type": "1", "parent_menu_id": "0"}
+        soup = bs4.BeautifulSoup(request_data(url_ch, params_ch, method='POST', output='html', session=sess), htmlparser)
+        raw_channels = [unquote(x.find('span', {'class': 'ch'}).text.strip()) for x in soup.select('li > a')]
+        all_channels = [{
+            'KT Name': ' '.join(x.split()[1:]),
+            'KTCh': int(x.split()[0]),
+            'Source': 'KT',
+            'ServiceId': x.split()[0]
+        } for x in raw_channels]
+        dump_channels('KT', all_channels)
+        return [x['ServiceId'] for x in all_channels]
+
+    try:
+        all_services = catalog.services('KT', fetch_channels)
+    except Exception as e:
+        log.error('체널 목록을 가져오지 못했습니다: %s', str(e))
+        all_services = None
+
+    def fetch_day(ChannelInfo, day):
+        data = request_data(url, dict(params, service_ch_no=ChannelInfo[3], seldate=day.strftime('%Y%m%d')), method='POST', output='html', session=sess, ret=None)
+        if data is None:
+            return FETCH_FAILED
+        return parse_page('KT', data, ChannelInfo, day)
+
+    for ChannelInfo, epginfo in fetch_days(check_services('KT', ChannelInfos, all_services, lambda x: x[3]), fetch_day):
+        epgzip(epginfo)
+
+
+def GetEPGFromLG(ChannelInfos):
+    if ChannelInfos:
+        log.info('소스가 LG인 채널을 가져오고 있습니다.')
+    else:
+        return
+
+    url = 'http://www.uplus.co.kr/css/chgi/chgi/RetrieveTvSchedule.hpi'
+    referer = 'http://www.uplus.co.kr/css/chgi/chgi/RetrieveTvContentsMFamily.hpi'
+    params = {'chnlCd': 'SVCID', 'evntCmpYmd': 'EPGDATE'}
+
+    sess = requests.session()
+    sess.headers.update({'User-Agent': ua, 'Referer': referer})
+
+    def fetch_day(ChannelInfo, day):
+        data = request_data(url, dict(params, chnlCd=ChannelInfo[3], evntCmpYmd=day.strftime('%Y%m%d')), method='POST', output='html', session=sess, ret=None)
+        if data is None:
+            return FETCH_FAILED
+        return parse_page('LG', data, ChannelInfo, day)
+
+    for ChannelInfo, epginfo in fetch_days(check_services('LG', ChannelInfos, None, lambda x: x[3]), fetch_day):
+        epgzip(epginfo)
+
+
+def GetEPGFromSK(ChannelInfos):
+    if ChannelInfos:
+        log.info('소스가 SK인 채널을 가져오고 있습니다.')
+    else:
+        return
+
+    for ChannelInfo in ChannelInfos:
+        log.warning('SK 서비스 중지! 다른 소스로 변경해서 사용하세요: %s' % ChannelInfo)
+
+    """
+    url = 'http://mobilebtv.com:8080/api/v3.0/epg'
+    referer = 'http://mobilebtv.com:8080/view/v3.0/epg'
+    icon_url = 'http://mobilebtv.com:8080/static/images/epg/channelLogo/nsepg_{}.png'
+
+    sess = requests.session()
+    sess.headers.update({'User-Agent': ua, 'Referer': referer})
+
+    def request_json(api_url, form_data):
+        ret = []
+        try:
+            data = request_data(api_url, form_data, method='GET', output='json', session=sess)
+            if data['statusCode'].lower() == 'ok':
+                ret = data['data']['ServiceInfoArray']
+            else:
+                raise ValueError('유효한 응답이 아닙니다: %s' % data['reason'])
+        except Exception as e:
+            log.error(str(e))
+        return ret
+
+    # dump all available channels to json
+    try:
+        all_channels = [{
+            'SK Name': x['NM_CH'],
+            'SKCh': int(x['NO_CH']),
+            'Icon_url': icon_url.format(x['ID_SVC']),
+            'Source': 'SK',
+            'ServiceId': x['ID_SVC']
+        } for x in request_json(url, {})]
+        dump_channels('SK', all_channels)
+        all_services = [x['ServiceId'] for x in all_channels]
+    except Exception as e:
+        log.error('체널 목록을 가져오지 못했습니다: %s', str(e))
+        all_services = [x[3] for x in ChannelInfos]
+
+    # remove unavailable channels in advance
+    newChannelInfos = []
+    for ChannelInfo in ChannelInfos:
+        ServiceId = ChannelInfo[3]
+        if ServiceId in all_services:
+            newChannelInfos.append(ChannelInfo)
+        else:
+            log.warning('없는 서비스 아이디입니다: %s', ChannelInfo)
+
+    params = {
+        'o_date': 'EPGDATE',
+        'serviceIds': '|'.join([info[3].strip() for info in newChannelInfos]),
+    }
+
+    for k in range(period):
+        day = today + timedelta(days=k)
+        # 기존에 날짜를 지정해서 가져오는 파라미터가 없어진것 같다. 누가 제보 좀...
+        params.update({'o_date': day.strftime('%Y%m%d')})
+        channels = {x['ID_SVC']: x['EventInfoArray'] for x in request_json(url + '/details', params)}
+
+        for ChannelInfo in newChannelInfos:
+            ServiceId = ChannelInfo[3]
+            if ServiceId in channels:
+                programs = channels[ServiceId]
+                writeSKPrograms(ChannelInfo, programs)
+            else:
+                log.warning('해당 날짜에 EPG 정보가 없거나 없는 채널입니다: %s %s' % (day.strftime('%Y%m%d'), ChannelInfo))
+
+    log.info('SK EPG 완료: {}/{}개 채널'.format(len(newChannelInfos), len(ChannelInfos)))
+    """
+
+
+def GetEPGFromSKB(ChannelInfos):
+    if ChannelInfos:
+        log.info('소스가 SKB인 채널을 가져오고 있습니다.')
+    else:
+        return
+
+    url = 'http://m.skbroadband.com/content/realtime/Channel_List.do'
+    referer = 'http://m.skbroadband.com/content/realtime/Channel_List.do'
+    params = {'key_depth2': 'SVCID', 'key_depth3': 'EPGDATE'}
+
+    sess = requests.session()
+    sess.headers.update({'User-Agent': ua, 'Referer': referer})
+
+    # dump all available channels to json
+    def fetch_channels():
+        url_ch = 'https://m.skbroadband.com/content/realtime/Realtime_List_Ajax.do'
+        params_ch = {"package_name": "PM50305785", "pack": "18"}
+        all_channels = [{
+            'SKB Name': x['m_name'],
+            'SKBCh': int(x['ch_no']),
+            'Source': 'SKB',
+            'ServiceId': x['c_menu'],
+        } for x in request_data(url_ch, params_ch, method='POST', output='json', session=sess) if x['depth'] == '2']
+        dump_channels('SKB', all_channels)
+        return [x['ServiceId'] for x in all_channels]
+
+    try:
+        all_services = catalog.services('SKB', fetch_channels)
+    except Exception as e:
+        log.error('체널 목록을 가져오지 못했습니다: %s', str(e))
+        all_services = None
+
+    def fetch_day(ChannelInfo, day):
+        data = request_data(url, dict(params, key_depth2=ChannelInfo[3], key_depth3=day.strftime('%Y%m%d')), method='GET', output='html', session=sess, ret=None)
+        if data is None:
+            return FETCH_FAILED
+        return parse_page('SKB', data, ChannelInfo, day)
+
+    for ChannelInfo, epginfo in fetch_days(check_services('SKB', ChannelInfos, all_services, lambda x: x[3]), fetch_day):
+        epgzip(epginfo)
+
+
+# SKB 페이지 정리: 인코딩 선언을 utf-8로 바꾸고 주석, 회차/화질 표시, 숨은 제목을 지우며
+# 프로그램 제목 줄은 태그가 섞이지 않도록 escape 한다
+# 모든 경우가 '<'로 시작해야 정규식이 빠르게 건너뛸 수 있다
+_skb_strip = (r'!--[\s\S]*?-->'
+              r'|span class="round_flag flag(?:0[234]|09|1[012])">.*?</span>'
+              r'|strong class="hide">프로그램 안내</strong>'
+              r'|(?P<meta>meta[^>]*?)EUC-KR')
+_skb_strip_RE = re.compile('<(?:' + _skb_strip + ')')
+# 제목 줄에서 시작한 주석은 줄이 바뀌어도 제목에 포함시켜 지운다 (예전처럼 주석을 먼저 지운 것과 같음)
+_skb_RE = re.compile('<(?:' + _skb_strip + r'|p class="(?:cont|tit)">(?P<title>[^<\n]*(?:(?:<!--[\s\S]*?-->|<)[^<\n]*)*))')
+
+
+def _skb_strip_replacement(match):
+    return '<' + match.group('meta') + 'utf-8' if match.group('meta') else ''
+
+
+def _skb_replacement(match):
+    if match.group('title') is None:
+        return _skb_strip_replacement(match)
+    programName = _skb_strip_RE.sub(_skb_strip_replacement, match.group('title'))
+    programName = unescape(programName).replace('<', '&lt;').replace('>', '&gt;').strip()
+    return '<p class="cont">' + programName
+
+
+def preprocess_skb(data):
+    """SKB 편성표 html을 한번만 훑으면서 BeautifulSoup에 넘기기 전에 정리한다"""
+    return _skb_RE.sub(_skb_replacement, data)
+
+
+def GetEPGFromNaver(ChannelInfos):
+    if ChannelInfos:
+        log.info('소스가 NAVER인 채널을 가져오고 있습니다.')
+    else:
+        return
+
+    url = 'https://m.search.naver.com/p/csearch/content/nqapirender.nhn'
+    referer = 'https://m.search.naver.com/search.naver?where=m&query=%ED%8E%B8%EC%84%B1%ED%91%9C'
+    params = {
+        'key': 'SingleChannelDailySchedule',
+        'where': 'm',
+        'pkid': '66',
+        'u1': 'SVCID',
+        'u2': 'EPGDATE'
+    }
+
+    sess = requests.session()
+    sess.headers.update({'User-Agent': ua, 'Referer': referer})
+
+    def fetch_day(ChannelInfo, day):
+        data = request_data(url, dict(params, u1=ChannelInfo[3], u2=day.strftime('%Y%m%d')), method='GET', output='json', session=sess, ret=None)
+        if data is None:
+            return FETCH_FAILED
+        try:
+            if data['statusCode'].lower() != 'success':
+                log.error('유효한 응답이 아닙니다: %s %s' % (ChannelInfo, data['statusCode']))
+                return []
+            html = ''.join(data['dataHtml'])
+        except Exception as e:
+            log.error('파싱 에러: %s: %s' % (ChannelInfo, str(e)))
+            return []
+        return parse_page('NAVER', html, ChannelInfo, day)
+
+    for ChannelInfo, epginfo in fetch_days(check_services('NAVER', ChannelInfos, None, lambda x: x[3]), fetch_day):
+        epgzip(epginfo)
+
+
+def GetEPGFromWAVVE(reqChannels):
+    if reqChannels:
+        log.info('소스가 WAVVE인 채널을 가져오고 있습니다.')
+    else:
+        return
+
+    '''
+    개별채널: https://apis.pooq.co.kr/live/epgs/channels/{ServideId}
+    전체채널: https://apis.pooq.co.kr/live/epgs
+    정보량은 거의 비슷
+    '''
+
+    url = 'https://apis.pooq.co.kr/live/epgs'
+    referer = 'https://www.wavve.com/schedule/index.html'
+    params = {
+        'enddatetime': '2020-01-20 24:00',
+        'genre': 'all',
+        'limit': 200,
+        'offset': 0,
+        'startdatetime': '2020-01-20 21:00',
+        'apikey': 'E5F3E0D30947AA5440556471321BB6D9',
+        'credential': 'none',
+        'device': 'pc',
+        'drm': 'wm',
+        'partner': 'pooq',
+        'pooqzone': 'none',
+        'region': 'kor',
+        'targetage': 'auto',
+    }
+
+    sess = requests.session()
+    sess.headers.update({'User-Agent': ua, 'Referer': referer})
+
+    # update parameters for requests
+    params.update({
+        'startdatetime': today.strftime('%Y-%m-%d') + ' 00:00',
+        'enddatetime': (today + timedelta(days=period-1)).strftime('%Y-%m-%d') + ' 24:00',
+    })
+
+    def get_page(page):
+        data = request_data(url, dict(params, offset=(page - 1) * params['limit']), method='GET', output='json', session=sess)
+        if 'pagecount' in data:
+            return data['list'], max(1, -(-int(data['pagecount']) // params['limit']))
+        return data['list'], None if len(data['list']) == params['limit'] else page
+
+    channellist, _ = paginate(get_page, url)
+    channeldict = {x['channelid']: x for x in channellist}
+
+    # dump all available channels to json
+    all_channels = [{
+        'WAVVE Name': x['channelname'],
+        'Icon_url': 'https://' + x['channelimage'],
+        'Source': 'WAVVE',
+        'ServiceId': x['channelid']
+    } for x in channellist]
+    dump_channels('WAVVE', all_channels)
+
+    # remove unavailable channels in advance
+    # reqChannels = all_channels  # request all channels
+    reqChannels = check_services('WAVVE', reqChannels, set(channeldict), lambda x: x.get('ServiceId'))
+
+    # 상세 정보는 프로그램을 출력하기 전에 programid별로 한번씩, 여러 개를 동시에 가져옴
+    programcache = {}
+    if wavve_more_details:
+        programids = [(program.get('programid') or '').strip() for reqChannel in reqChannels if reqChannel.get('ServiceId') in channeldict
+                      for program in channeldict[reqChannel['ServiceId']]['list']]
+        programids = list(dict.fromkeys(x for x in programids if x))   # 개별 programid가 없는 경우도 있음
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for programid, programdetail in zip(programids, executor.map(lambda x: getWAVVEProgramDetails(x, sess), programids)):
+                if programdetail is not None:
+                    programdetail[u'hit'] = 0  # to know cache hit rate
+                programcache[programid] = programdetail
+    start = time.perf_counter()
+
+    try:
+        for reqChannel in reqChannels:
+            if not ('ServiceId' in reqChannel and reqChannel['ServiceId'] in channeldict):
+                log.warning('EPG 정보가 없거나 없는 채널입니다: %s' % reqChannel)
+                continue
+
+            # 채널이름은 그대로 들어오고 프로그램 제목은 escape되어 들어옴
+            srcChannel = channeldict[reqChannel['ServiceId']]
+            channelid = reqChannel['Id'] if 'Id' in reqChannel else 'wavve|%s' % srcChannel['channelid']
+            channelname = reqChannel['Name'] if 'Name' in reqChannel else srcChannel['channelname'].strip()
+            channelicon = reqChannel['Icon_url'] if 'Icon_url' in reqChannel else 'https://' + srcChannel['channelimage']
+            # channelliveimg = "https://wchimg.pooq.co.kr/pooqlive/thumbnail/%s.jpg" % reqChannel['ServiceId']
+            writeChannel(channelid, [escape(channelname)], escape(channelicon))
+
+            for program in srcChannel['list']:
+                try:
+                    log.debug('{}/{}'.format(channelname, program['title']))
+                    startTime = datetime.strptime(program['starttime'], '%Y-%m-%d %H:%M').strftime('%Y%m%d%H%M%S')
+                    endTime = datetime.strptime(program['endtime'], '%Y-%m-%d %H:%M').strftime('%Y%m%d%H%M%S')
+
+                    # TODO: 제목 너무 지저분/부실하네
+                    # TODO: python3에서 re.match에 더 많이 잡힘. 왜?
+                    programName, subprogramName, episode, rebroadcast = parse_title('WAVVE', unescape(program['title']))
+
+                    rating = 0 if program['targetage'] == 'n' else int(program['targetage'])
+
+                    # 추가 정보 가져오기
+                    desc, category, iconurl, actors, producers = '', '', '', '', ''
+                    if wavve_more_details:
+                        programdetail = programcache.get((program.get('programid') or '').strip())
+                        if programdetail:
+                            programdetail[u'hit'] += 1
+                            # TODO: 추가 제목 정보 활용
+                            # programtitle = programdetail['programtitle']
+                            # log.info('%s / %s' % (programName, programtitle))
+                            desc = '\n'.join([x.replace('<br>', '\n').strip() for x in programdetail['programsynopsis'].splitlines()])     # carriage return(\r) 제거, <br> 제거
+                            category = programdetail['genretext'].strip()
+                            iconurl = 'https://' + programdetail['programposterimage'].strip()
+                            # tags = programdetail['tags']['list'][0]['text']
+                            if programdetail['actors']['list']:
+                                actors = ','.join([x['text'] for x in programdetail['actors']['list']])
+
+                    writeProgram(Programme(channelid, startTime, programName, subprogramName, desc, actors, producers, category, episode, rebroadcast, rating, endTime=endTime, iconurl=iconurl))
+                except Exception as e:
+                    log.error('파싱 에러: %s' % str(e))
+                    log.error(program)
+                    metrics.add('WAVVE', parse_errors=1)
+        log.info('WAVVE EPG 완료: {}개 채널'.format(len(reqChannels)))
+    except Exception as e:
+        log.error(str(e))
+    finally:
+        # 상세 정보는 programid별로 한번만 요청하고 나머지는 programcache에서 찾음
+        uses = sum(x['hit'] for x in programcache.values() if x)
+        metrics.add('WAVVE', parse_seconds=time.perf_counter() - start,
+                    detail_requests=len(programcache), detail_cache_hits=uses - len([x for x in programcache.values() if x]))
+
+
+# 상세 정보에서 쓰는 항목 (detailcache에는 이것만 저장)
+WAVVE_DETAIL_KEYS = ['programsynopsis', 'genretext', 'programposterimage', 'actors']
+
+
+def getWAVVEProgramDetails(programid, sess):
+    if detailcache is not None:
+        ret = detailcache.get(programid)
+        if ret is not None:
+            metrics.add('WAVVE', detail_store_hits=1)
+            return ret
+
+    url = 'https://apis.pooq.co.kr/vod/programs-contentid/' + programid
+    referer = 'https://www.wavve.com/player/vod?programid=' + programid
+    param = {
+        "apikey": "E5F3E0D30947AA5440556471321BB6D9",
+        "credential": "none",
+        "device": "pc",
+        "drm": "wm",
+        "partner": "pooq",
+        "pooqzone": "none",
+        "region": "kor",
+        "targetage": "auto"
+    }
+    # 여러 스레드에서 같은 세션을 쓰므로 세션 헤더는 바꾸지 않음
+    headers = {'Referer': referer}
+
+    ret = None
+    try:
+        contentid = request_data(url, param, method='GET', output='json', session=sess, headers=headers)['contentid'].strip()
+
+        # url2 = 'https://apis.pooq.co.kr/cf/vod/contents/' + contentid
+        url2 = 'https://apis.pooq.co.kr/vod/contents/' + contentid    # 같은 주소지만 이게 더 안정적인듯
+        detail = request_data(url2, param, method='GET', output='json', session=sess, headers=headers)
+        ret = {k: detail[k] for k in WAVVE_DETAIL_KEYS}
+        if detailcache is not None:
+            detailcache.put(programid, contentid, ret)
+    except Exception as e:
+        log.error(str(e))
+    return ret
+
+
+def GetEPGFromTVING(reqChannels):
+    if reqChannels:
+        log.info('소스가 TVING인 채널을 가져오고 있습니다.')
+    else:
+        return
+
+    url = 'https://api.tving.com/v2/media/schedules'
+    referer = 'https://www.tving.com/schedule/main.do'
+    params = {
+        "pageNo": "1",
+        "pageSize": "20",   # maximum 20
+        "order": "chno",
+        "scope": "all",
+        "adult": "all",
+        "free": "all",
+        "broadDate": "20200608",
+        "broadcastDate": "20200608",
+        "startBroadTime": "030000",  # 최대 3시간 간격
+        "endBroadTime": "060000",
+        # "channelCode": "C06941,C07381,...",
+        "screenCode": "CSSD0100",
+        "networkCode": "CSND0900",
+        "osCode": "CSOD0900",
+        "teleCode": "CSCD0900",
+        "apiKey": "1e7952d0917d6aab1f0293a063697610",
+    }
+
+    sess = requests.session()
+    sess.headers.update({'User-Agent': ua, 'Referer': referer})
+
+    requested = 0
+
+    def get_json(_params):
+        """모든 페이지의 결과와 요청한 페이지 수를 돌려준다"""
+        nonlocal requested
+
+        def get_page(_page):
+            _data = request_data(url, dict(_params, pageNo=str(_page)), method='GET', output='json', session=sess)
+            if not _data or _data['header']['status'] != 200:
+                raise requests.exceptions.RequestException
+            return _data['body']['result'], None if _data['body']['has_more'] == 'Y' else _page
+
+        _results, _pages = paginate(get_page, url)
+        requested += _pages
+        return _results, _pages
+
+    def get_imgurl(_item):
+        priority_img_code = ['CAIC1600', 'CAIC0100', 'CAIC0400']
+        for img_code in priority_img_code:
+            img_list = [x for x in _item['image'] if x['code'] == img_code]
+            if img_list:
+                return 'https://image.tving.com' + (img_list[0]['url'] if 'url' in img_list[0] else img_list[0]['url2'])
+
+    def grouper(iterable, n):
+        it = iter(iterable)
+        group = tuple(islice(it, n))
+        while group:
+            yield group
+            group = tuple(islice(it, n))
+
+    gcode = {
+        'CPTG0100': 0,
+        'CPTG0200': 7,
+        'CPTG0300': 12,
+        'CPTG0400': 15,
+        'CPTG0500': 19,
+        'CMMG0100': 0,
+        'CMMG0200': 12,
+        'CMMG0300': 15,
+        'CMMG0400': 19,
+    }
+
+    # update parameters for requests
+    params.update({
+        'broadDate': today.strftime('%Y%m%d'),
+        'broadcastDate': today.strftime('%Y%m%d'),
+        "startBroadTime": now.strftime('%H') + "0000",
+        "endBroadTime": (now + timedelta(hours=3)).strftime('%H') + "0000",
+    })
+
+    def fetch_channels():
+        channellist, _ = get_json(params)
+        all_channels = [{
+            'TVING Name': x['channel_name']['ko'],
+            'Icon_url': get_imgurl(x),
+            'Source': 'TVING',
+            'ServiceId': x['channel_code']
+        } for x in channellist if x['schedules'] is not None]
+        dump_channels('TVING', all_channels)
+        return [x['channel_code'] for x in channellist]
+
+    # remove unavailable channels in advance
+    # reqChannels = all_channels  # request all channels
+    reqChannels = check_services('TVING', reqChannels, catalog.services('TVING', fetch_channels), lambda x: x.get('ServiceId'))
+
+    def window(day, hour, hours):
+        params.update({
+            'broadDate': day.strftime('%Y%m%d'),
+            'broadcastDate': day.strftime('%Y%m%d'),
+            "startBroadTime": '{:02d}'.format(hour) + "0000",
+            "endBroadTime": '{:02d}'.format(hour + hours) + "0000",
+        })
+        return get_json(params)
+
+    def probe(day, keys):
+        """3시간 창들로 받은 (채널, 시작 시각)을 더 큰 창 하나로 모두 받는지 큰 창부터 확인해서
+        쓸 수 있는 가장 큰 창 크기를 돌려준다 (API가 창을 잘라서 돌려주면 빠지는 프로그램이 생김)"""
+        for hours in TVING_WINDOWS[:-1]:
+            limit = int((datetime.combine(day, datetime.min.time()) + timedelta(hours=hours)).strftime('%Y%m%d%H%M%S'))
+            try:
+                chs, _ = window(day, 0, hours)
+            except requests.exceptions.RequestException:
+                log.debug('TVING %d시간 창을 쓸 수 없습니다.', hours)
+                continue
+            got = {(ch['channel_code'], sch['broadcast_start_time']) for ch in chs for sch in ch['schedules'] or []}
+            if all(x in got for x in keys if int(x[1]) < limit):
+                log.debug('TVING %d시간 창이 3시간 창과 같은 프로그램을 돌려주어 %d시간 창을 씁니다.', hours, hours)
+                return hours
+            log.debug('TVING %d시간 창 응답에 빠진 프로그램이 있어 쓰지 않습니다.', hours)
+        return TVING_WINDOWS[-1]
+
+    # 시간 창은 API 문서의 최대값인 3시간으로 시작하고, 프로그램이 있는 첫 (채널 묶음, 날짜)를
+    # 3시간 창들로 받은 뒤 더 큰 창 하나로 같은 프로그램을 모두 받는지 확인해서 늘린다.
+    # 창 하나에 페이지가 더 필요했으면 다음 창을 줄이고, 한 페이지로 끝나면 다시 늘린다.
+    # 창 경계에 걸친 프로그램은 양쪽 창에 모두 오므로 (채널, 시작 시각)으로 한번만 넣는다.
+    channeldict, seen, failed = {}, set(), set()
+    sizes = [TVING_WINDOWS[-1]]
+    size, groups, before, probed = 0, 0, requested, False
+    for chgroup in grouper([x['ServiceId'].strip() for x in reqChannels], 20):
+        groups += 1
+        params.update({"channelCode": ','.join(list(chgroup))})
+        for k in range(period):
+            day = today + timedelta(days=k)
+            hour, keys = 0, set()
+            while hour < 24:
+                hours = min(sizes[size], 24 - hour)
+                try:
+                    chs, pages = window(day, hour, hours)
+                except requests.exceptions.RequestException:
+                    if size + 1 < len(sizes):
+                        log.debug('TVING %d시간 창을 쓸 수 없어 줄입니다.', sizes[size])
+                        sizes = sizes[size + 1:]
+                        size = 0
+                        continue
+                    log.error('EPG 정보를 가져오지 못했습니다: TVING %s %s %s', params['channelCode'], params['broadDate'], params['startBroadTime'])
+                    failed.update(chgroup)
+                    chs, pages = [], 1
+                for ch in chs:
+                    code = ch['channel_code']
+                    if code not in channeldict:
+                        channeldict[code] = dict(ch, schedules=[])
+                    for sch in ch['schedules'] or []:
+                        keys.add((code, sch['broadcast_start_time']))
+                        if (code, sch['broadcast_start_time']) not in seen:
+                            seen.add((code, sch['broadcast_start_time']))
+                            channeldict[code]['schedules'].append(sch)
+                hour += hours
+                if pages > 1 and size + 1 < len(sizes):
+                    size += 1
+                elif pages == 1 and size > 0:
+                    size -= 1
+            if not probed and keys:
+                probed = True
+                largest = probe(day, keys)
+                sizes, size = [x for x in TVING_WINDOWS if x <= largest], 0
+    used, fixed = requested - before, groups * period * 24 // TVING_WINDOWS[-1]
+    log.info('TVING 요청 %d개 (3시간 창 고정이면 %d개 이상, %d개 절약), 중복 제외 %d개 프로그램', used, fixed, fixed - used, len(seen))
+    metrics.add('TVING', schedule_requests=used, schedule_requests_saved=fixed - used)
+
+    start = time.perf_counter()
+    for reqChannel in reqChannels:
+        if not ('ServiceId' in reqChannel and reqChannel['ServiceId'] in channeldict):
+            log.warning('EPG 정보가 없거나 없는 채널입니다: %s' % reqChannel)
+            # 요청이 실패한 채널은 다음 실행에서 다시 요청한다
+            if reqChannel.get('ServiceId') not in failed:
+                catalog.mark_dead('TVING', reqChannel.get('ServiceId'))
+            continue
+        srcChannel = channeldict[reqChannel['ServiceId']]
+        channelid = reqChannel['Id'] if 'Id' in reqChannel else 'tving|%s' % srcChannel['channel_code']
+        channelname = reqChannel['Name'] if 'Name' in reqChannel else srcChannel['channel_name']['ko'].strip()
+        channelicon = reqChannel['Icon_url'] if 'Icon_url' in reqChannel else get_imgurl(srcChannel)
+        writeChannel(channelid, [escape(channelname)], escape(channelicon))
+
+        for sch in srcChannel['schedules']:
+            # 공통
+            startTime = str(sch['broadcast_start_time'])
+            endTime = str(sch['broadcast_end_time'])
+            rebroadcast = True if sch['rerun_yn'] == 'Y' else False
+
+            get_from = 'movie' if sch['movie'] else 'program'
+            img_code = 'CAIM2100' if sch['movie'] else 'CAIP0900'
+
+            rating = gcode[sch[get_from]['grade_code']]
+
+            programName = sch[get_from]['name']['ko']
+            subprogramName = sch[get_from]['name']['en'] if sch[get_from]['name']['en'] else ''
+
+            category = sch[get_from]['category1_name']['ko']
+            actors = ','.join(sch[get_from]['actor'])
+            producers = ','.join(sch[get_from]['director'])
+
+            iconurl = ''
+            poster = [x['url'] for x in sch[get_from]['image'] if x['code'] == img_code]
+            if poster:
+                iconurl = 'https://image.tving.com' + poster[0]
+                # iconurl += '/dims/resize/236'
+
+            episode = ''
+            desc = sch[get_from]['story' if sch['movie'] else 'synopsis']['ko']
+            if sch['episode']:
+                episode = sch['episode']['frequency']
+                episode = '' if episode == 0 else str(episode)
+                desc = sch['episode']['synopsis']['ko']
+
+            writeProgram(Programme(channelid, startTime, programName, subprogramName, desc, actors, producers, category, episode, rebroadcast, rating, endTime=endTime, iconurl=iconurl))
+    metrics.add('TVING', parse_seconds=time.perf_counter() - start)
+    log.info('TVING EPG 완료: {}개 채널'.format(len(reqChannels)))
+
+
+# TVING 시간 창 크기(시간), 큰 것부터 확인하며 마지막이 API 문서의 최대값(3시간)
+TVING_WINDOWS = (24, 12, 6, 3)
+
+
+class NoEpgData(Exception):
+    """해당 채널, 날짜의 EPG 정보가 없음"""
+
+
+# HTML 소스별 파서
+# 같은 페이지에 대해 lxml(XPath)과 BeautifulSoup 파서는 같은 epginfo를 만들어야 한다
+class _xpath:
+    """처음 쓸 때 컴파일하는 lxml.etree.XPath"""
+    __slots__ = ('expr', 'compiled')
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.compiled = None
+
+    def __call__(self, node):
+        if self.compiled is None:
+            self.compiled = lxml_etree.XPath(self.expr)
+        return self.compiled(node)
+
+
+def _has_class(name):
+    return 'contains(concat(" ", normalize-space(@class), " "), " %s ")' % name
+
+
+def _lxml_document(data):
+    return lxml_html.document_fromstring(data) if data.strip() else None
+
+
+def parse_kt_soup(data, ChannelInfo, day):
+    soup = bs4.BeautifulSoup(data, htmlparser, parse_only=bs4.SoupStrainer('tbody'))
+    for row in soup.find_all('tr'):
+        cell = row.find_all('td')
+        for minute, program, category in zip(cell[1].find_all('p'), cell[2].find_all('p'), cell[3].find_all('p')):
+            ratings = [image['alt'] for image in program.find_all('img', alt=True)]
+            yield kt_row(ChannelInfo, day, cell[0].text, minute.text, program.text, category.text, ratings)
+
+
+_kt_rows = _xpath('//tbody//tr')
+_kt_cells = _xpath('.//td')
+_kt_ps = _xpath('.//p')
+_kt_alts = _xpath('.//img/@alt')
+
+
+def parse_kt_lxml(data, ChannelInfo, day):
+    root = _lxml_document(data)
+    for row in (_kt_rows(root) if root is not None else []):
+        cell = _kt_cells(row)
+        for minute, program, category in zip(_kt_ps(cell[1]), _kt_ps(cell[2]), _kt_ps(cell[3])):
+            yield kt_row(ChannelInfo, day, cell[0].text_content(), minute.text_content(), program.text_content(), category.text_content(), _kt_alts(program))
+
+
+def kt_row(ChannelInfo, day, hour, minute, program, category, ratings):
+    startTime = str(day) + ' ' + hour.strip() + ':' + minute.strip()
+    startTime = datetime.strptime(startTime, '%Y-%m-%d %H:%M').strftime('%Y%m%d%H%M%S')
+    programName = program.replace('방송중 ', '').strip()
+    rating = 0
+    for alt in ratings:
+        grade = re.match(r'([\d,]+)', alt)
+        if grade:
+            rating = int(grade.group(1))
+    return Programme(ChannelInfo[0], startTime, programName, category=category.strip(), rating=rating)
+
+
+def preprocess_lg(data):
+    return data.replace('<재>', '&lt;재&gt;').replace(' [..', '').replace(' (..', '')
+
+
+def parse_lg_soup(data, ChannelInfo, day):
+    soup = bs4.BeautifulSoup(preprocess_lg(data), htmlparser, parse_only=bs4.SoupStrainer('table'))
+    if not str(soup):
+        raise NoEpgData
+    for row in soup.find('table').tbody.find_all('tr'):
+        cell = row.find_all('td')
+        rating_str = cell[1].find('span', {'class': 'tag cte_all'}).text
+        cell[1].find('span', {'class': 'tagGroup'}).decompose()
+        yield lg_row(ChannelInfo, day, cell[0].text, cell[1].text, cell[2].text, rating_str)
+
+
+_lg_table = _xpath('//table')
+_lg_rows = _xpath('(.//tbody)[1]//tr')
+_lg_cells = _xpath('.//td')
+_lg_rating = _xpath('.//span[@class="tag cte_all"]')
+_lg_taggroup = _xpath('.//span[%s]' % _has_class('tagGroup'))
+
+
+def parse_lg_lxml(data, ChannelInfo, day):
+    root = _lxml_document(preprocess_lg(data))
+    tables = _lg_table(root) if root is not None else []
+    if not tables:
+        raise NoEpgData
+    for row in _lg_rows(tables[0]):
+        cell = _lg_cells(row)
+        rating_str = _lg_rating(cell[1])[0].text_content()
+        _lg_taggroup(cell[1])[0].drop_tree()
+        yield lg_row(ChannelInfo, day, cell[0].text_content(), cell[1].text_content(), cell[2].text_content(), rating_str)
+
+
+def lg_row(ChannelInfo, day, time, title, category, rating_str):
+    startTime = datetime.strptime(str(day) + ' ' + time, '%Y-%m-%d %H:%M').strftime('%Y%m%d%H%M%S')
+    rating = 0 if rating_str.strip() == 'All' else int(rating_str.strip())
+    programName, subprogramName, episode, rebroadcast = parse_title('LG', title.strip())
+    return Programme(ChannelInfo[0], startTime, programName, subprogramName, category=category.strip(), episode=episode, rebroadcast=rebroadcast, rating=rating)
+
+
+def parse_skb_soup(data, ChannelInfo, day):
+    strainer = bs4.SoupStrainer('div', {'id': 'uiScheduleTabContent'})
+    soup = bs4.BeautifulSoup(preprocess_skb(data), htmlparser, parse_only=strainer)
+    html = soup.find_all('li', {'class': 'list'}) if soup.find_all('li') else ''
+    if not html:
+        raise NoEpgData
+    for row in html:
+        cell = row.find('p', {'class': 'cont'})
+        grade = row.find('i', {'class': 'hide'})
+        if cell and cell.find('span'):
+            cell.span.decompose()
+        yield skb_row(ChannelInfo, day, row.find('p', {'class': 'time'}).text, cell.text if cell else None, grade.text if grade is not None else None)
+
+
+_skb_lis = _xpath('//div[@id="uiScheduleTabContent"]//li')
+_skb_rows = _xpath('//div[@id="uiScheduleTabContent"]//li[%s]' % _has_class('list'))
+_skb_time = _xpath('.//p[%s]' % _has_class('time'))
+_skb_cont = _xpath('.//p[%s]' % _has_class('cont'))
+_skb_grade = _xpath('.//i[%s]' % _has_class('hide'))
+_skb_span = _xpath('.//span')
+
+
+def parse_skb_lxml(data, ChannelInfo, day):
+    root = _lxml_document(preprocess_skb(data))
+    html = _skb_rows(root) if root is not None and _skb_lis(root) else []
+    if not html:
+        raise NoEpgData
+    for row in html:
+        cell = _skb_cont(row)
+        grade = _skb_grade(row)
+        if cell and _skb_span(cell[0]):
+            _skb_span(cell[0])[0].drop_tree()
+        yield skb_row(ChannelInfo, day, _skb_time(row)[0].text_content(), cell[0].text_content() if cell else None, grade[0].text_content() if grade else None)
+
+
+def skb_row(ChannelInfo, day, time, title, grade):
+    startTime = datetime.strptime(str(day) + ' ' + time, '%Y-%m-%d %H:%M').strftime('%Y%m%d%H%M%S')
+    rating = int(grade.replace('세 이상', '').strip()) if grade is not None else 0
+    programName, subprogramName, episode, rebroadcast = parse_title('SKB', title.strip()) if title is not None else ('', '', '', False)
+    return Programme(ChannelInfo[0], startTime, programName, subprogramName, episode=episode, rebroadcast=rebroadcast, rating=rating)
+
+
+def parse_naver_soup(data, ChannelInfo, day):
+    soup = bs4.BeautifulSoup(data, htmlparser)
+    for row in soup.find_all('li', {'class': 'list'}):
+        cell = row.find_all('div')
+        yield naver_row(ChannelInfo, day, cell[1].text, cell[4].text, cell[5].text if len(cell) > 5 else '', bool(cell[3].find('span', {'class': 're'})))
+
+
+_naver_rows = _xpath('//li[%s]' % _has_class('list'))
+_naver_cells = _xpath('.//div')
+_naver_re = _xpath('.//span[%s]' % _has_class('re'))
+
+
+def parse_naver_lxml(data, ChannelInfo, day):
+    root = _lxml_document(data)
+    for row in (_naver_rows(root) if root is not None else []):
+        cell = _naver_cells(row)
+        yield naver_row(ChannelInfo, day, cell[1].text_content(), cell[4].text_content(), cell[5].text_content() if len(cell) > 5 else '', bool(_naver_re(cell[3])))
+
+
+def naver_row(ChannelInfo, day, time, title, subtitle, rebroadcast):
+    startTime = datetime.strptime(str(day) + ' ' + time.strip(), '%Y-%m-%d %H:%M').strftime('%Y%m%d%H%M%S')
+    return Programme(ChannelInfo[0], startTime, unescape(title.strip()), subtitle.strip(), rebroadcast=rebroadcast)
+
+
+HTML_PARSERS = {
+    'KT': (parse_kt_lxml, parse_kt_soup),
+    'LG': (parse_lg_lxml, parse_lg_soup),
+    'SKB': (parse_skb_lxml, parse_skb_soup),
+    'NAVER': (parse_naver_lxml, parse_naver_soup),
+}
+
+
+def parse_rows(source, data, ChannelInfo, day, parser):
+    """parse_page()의 파싱 단계로 parse_pool의 다른 프로세스에서도 돈다
+
+    (행 목록, 걸린 시간, 에러)를 돌려준다. 에러가 나도 그때까지 만든 행은 돌려주고
+    NoEpgData가 아닌 에러는 프로세스 사이로 넘길 수 있게 Exception으로 바꾼다.
+    """
+    lxml_parser, soup_parser = HTML_PARSERS[source]
+    rows, error = [], None
+    start = time.perf_counter()
+    try:
+        for row in (lxml_parser if parser == 'lxml' else soup_parser)(data, ChannelInfo, day):
+            rows.append(row)
+    except NoEpgData as e:
+        error = e
+    except Exception as e:
+        error = Exception(str(e))
+    return rows, time.perf_counter() - start, error
+
+
+def parse_page(source, data, ChannelInfo, day):
+    """fetch_day에서 받은 소스별 편성표 html을 epginfo로 만든다
+
+    lxml이 있으면 XPath 파서를, 없으면 BeautifulSoup 파서를 쓴다. parse_workers가
+    있으면 파싱을 parse_pool에 넘기고 결과를 줄 Future를 바로 돌려주므로 요청하는 스레드는
+    다음 (채널, 날짜)를 받으러 가고, fetch_days()가 날짜를 모을 때 결과를 기다린다.
+    """
+    if parse_pool is None:
+        return parsed(source, ChannelInfo, parse_rows(source, data, ChannelInfo, day, htmlparser))
+    try:
+        job = parse_pool.submit(parse_rows, source, data, ChannelInfo, day, htmlparser)
+    except Exception as e:
+        return parsed(source, ChannelInfo, ([], 0, e))
+    future = Future()
+
+    def done(job):
+        try:
+            result = job.result()
+        except Exception as e:
+            result = ([], 0, e)
+        future.set_result(parsed(source, ChannelInfo, result))
+
+    job.add_done_callback(done)
+    return future
+
+
+def parsed(source, ChannelInfo, result):
+    """parse_rows()의 (행 목록, 걸린 시간, 에러)를 fetch_day가 돌려줄 epginfo로 바꾼다
+
+    EPG가 없는 페이지면 None을, 파싱 에러가 나면 로그를 남기고 그때까지 만든 행을 돌려준다.
+    파싱 시간과 에러는 metrics에 더한다.
+    """
+    rows, seconds, error = result
+    metrics.add(source, parse_seconds=seconds)
+    if isinstance(error, NoEpgData):
+        log.warning('EPG 정보가 없거나 없는 채널입니다: %s' % ChannelInfo)
+        # 오늘 없으면 내일도 없는 채널로 간주
+        return None
+    if error is not None:
+        metrics.add(source, parse_errors=1)
+        log.error('파싱 에러: %s: %s' % (ChannelInfo, str(error)))
+    return rows
+
+
+def paginate(get_page, url):
+    """여러 페이지로 나눠 주는 API의 모든 페이지를 가져와 순서대로 합친다
+
+    get_page(n)은 n번째(1부터) 페이지의 (목록, 마지막 페이지 번호)를 돌려준다.
+    마지막 페이지 번호는 더 있는데 몇 페이지인지 모르면 None이다.
+    페이지 수를 알면 (WAVVE) 나머지를 url 호스트의 burst만큼 동시에 요청하고, 모르면 (TVING)
+    다음 burst개 페이지를 한번에 요청한다. 빈 페이지, 마지막 페이지, 에러가 나온 곳을
+    데이터의 끝으로 보고 그 뒤 페이지의 결과는 버린다. 에러 뒤의 페이지에 데이터가 있으면
+    에러를 그대로 일으키고, 없으면 그 페이지를 한번 더 요청해서 또 에러일 때만 끝으로 본다.
+    (합친 목록, 실제로 요청한 페이지 수)를 돌려준다.
+    """
+    width = host_limits.get(urlparse(url).hostname, (1 / req_sleep, 1))[1]
+    items, last = get_page(1)
+    pages, requested, done = [items], 1, last is not None or not items
+    if done and last is not None and last > 1:
+        with ThreadPoolExecutor(max_workers=width) as executor:
+            pages.extend(items for items, _ in executor.map(get_page, range(2, last + 1)))
+        requested = last
+    while not done:
+        start = len(pages) + 1
+        results = []
+        with ThreadPoolExecutor(max_workers=width) as executor:
+            for future in [executor.submit(get_page, n) for n in range(start, start + width)]:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+        requested += width
+        for n, result in enumerate(results, start):
+            if isinstance(result, Exception):
+                if any(not isinstance(x, Exception) and x[0] for x in results[n - start + 1:]):
+                    raise result
+                try:
+                    requested += 1
+                    result = get_page(n)
+                except Exception as e:
+                    log.debug('%d 페이지 요청이 다시 실패해서 데이터의 끝으로 봅니다: %s', n, str(e))
+                    done = True
+                    break
+            items, last = result
+            if items:
+                pages.append(items)
+            if last is not None or not items:
+                done = True
+                break
+    return [x for items in pages for x in items], requested
+
+
+# fetch_day가 요청에 실패했을 때 돌려주는 값 (EPG가 없는 것과 구분)
+FETCH_FAILED = object()
+
+
+def fetch_days(ChannelInfos, fetch_day):
+    """(채널, 날짜)마다 fetch_day(ChannelInfo, day)를 worker 수만큼 동시에 실행
+
+    채널 순서대로 (ChannelInfo, epginfo)를 돌려주며 epginfo는 날짜 순서로 합친다.
+    fetch_day가 파싱 중인 Future를 반환하면 (parse_pool) 여기서 날짜를 모을 때 기다리므로
+    요청 스레드는 파싱을 기다리지 않는다.
+    fetch_day가 None을 반환하면 (받은 페이지에 EPG가 없으면) 그 채널에 EPG가 없는 것으로
+    보고 이후 날짜는 요청하지 않거나 받은 결과를 버린다. 첫날부터 없으면 catalog에
+    EPG가 없던 채널로 남긴다. 요청이 실패해서 FETCH_FAILED를 반환하면 그 날짜만
+    건너뛰고 상태 파일에도 남기지 않아 다음 실행에서 다시 요청한다.
+    """
+    nodata = {}     # 채널 순번: EPG가 없는 첫 날짜 순번
+
+    def work(i, k):
+        """(epginfo 또는 Future, 상태 파일에 저장할 키)"""
+        if nodata.get(i, period) < k:
+            return None, None
+        ChannelInfo, day = ChannelInfos[i], today + timedelta(days=k)
+        key = '%s|%s|%s|%s' % (ChannelInfo[0], ChannelInfo[2], ChannelInfo[3], day.strftime('%Y%m%d'))
+        epginfo = state.get(key) if state is not None else None
+        if epginfo is not None:
+            return epginfo, None
+        return fetch_day(ChannelInfo, day), key
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [[executor.submit(work, i, k) for k in range(period)] for i in range(len(ChannelInfos))]
+        for i, (ChannelInfo, days) in enumerate(zip(ChannelInfos, futures)):
+            epginfo = []
+            for k, future in enumerate(days):
+                result, key = future.result()
+                if isinstance(result, Future):
+                    result = result.result()
+                if result is FETCH_FAILED:
+                    continue
+                if result and key is not None and state is not None:
+                    state.put(key, result)
+                if result is None:
+                    nodata[i] = min(nodata.get(i, period), k)
+                    if k == 0:
+                        catalog.mark_dead(ChannelInfo[2], ChannelInfo[3])
+                    for f in days[k+1:]:
+                        f.cancel()
+                    break
+                epginfo.extend(result)
+            yield ChannelInfo, epginfo
+
+
+class EpgState:
+    """증분 갱신을 위해 (채널, 날짜)별 epginfo를 저장하는 파일
+
+    Programme은 Programme.fields() 목록으로 저장한다.
+
+    max_age초 안에 가져온 항목은 다시 요청하지 않고 그대로 쓴다.
+    저장할 때는 이번 실행에서 쓰인 항목만 남기므로 지난 날짜나
+    더 이상 요청하지 않는 채널은 자동으로 빠진다.
+    """
+    def __init__(self, path, max_age):
+        self.path = path
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.old, self.new = {}, {}
+        self.hit = 0
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.old = json.load(f)
+            except Exception as e:
+                log.warning('상태 파일을 읽지 못해 새로 만듭니다: %s', str(e))
+
+    def get(self, key):
+        entry = self.old.get(key)
+        if entry is None or time.time() - entry['fetched'] >= self.max_age:
+            return None
+        with self.lock:
+            self.new[key] = entry
+            self.hit += 1
+        return [Programme(*row) for row in entry['rows']]
+
+    def put(self, key, rows):
+        with self.lock:
+            self.new[key] = {'fetched': time.time(), 'rows': [x.fields() for x in rows]}
+
+    def save(self):
+        log.info('증분 갱신: %d개 재사용, %d개 새로 가져옴', self.hit, len(self.new) - self.hit)
+        try:
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.new, f, ensure_ascii=False)
+            os.replace(self.path + '.tmp', self.path)
+        except Exception as e:
+            log.warning("파일 저장 중 에러: %s", self.path)
+            log.warning(str(e))
+
+
+class ChannelCatalog:
+    """소스별 채널 목록(서비스 아이디)과 EPG가 없던 채널을 기억하는 파일
+
+    채널 목록은 catalog_ttl에 정한 소스별 시간 동안 다시 요청하지 않으며
+    Channel_<소스>.json도 새로 가져올 때만 쓴다. 목록에 없는 서비스 아이디는
+    저장된 목록으로 걸러지고, 목록에는 있어도 EPG가 없던 채널은 cooldown초 동안
+    요청하지 않는다. path가 None이면 이번 실행 안에서만 기억한다.
+    """
+    def __init__(self, path, cooldown):
+        self.path = path
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.catalogs, self.dead = {}, {}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.catalogs, self.dead = data['catalogs'], data['dead']
+            except Exception as e:
+                log.warning('채널 목록 파일을 읽지 못해 새로 만듭니다: %s', str(e))
+
+    def services(self, source, fetch):
+        """source의 서비스 아이디 set
+
+        저장된 목록이 없거나 오래되었으면 fetch()로 새로 가져오고,
+        새로 가져오지 못하면 오래된 목록이라도 쓴다.
+        """
+        entry = self.catalogs.get(source)
+        if entry is not None and time.time() - entry['fetched'] < catalog_ttl.get(source, 0):
+            log.debug('저장된 %s 채널 목록을 사용합니다: %d개', source, len(entry['services']))
+            return set(entry['services'])
+        try:
+            services = list(fetch())
+        except Exception as e:
+            if entry is None:
+                raise
+            log.warning('%s 채널 목록을 가져오지 못해 저장된 목록을 사용합니다: %s', source, str(e))
+            return set(entry['services'])
+        with self.lock:
+            self.catalogs[source] = {'fetched': time.time(), 'services': services}
+        return set(services)
+
+    def is_dead(self, source, serviceid):
+        return self.dead.get('%s|%s' % (source, serviceid), 0) > time.time()
+
+    def mark_dead(self, source, serviceid):
+        if self.cooldown > 0:
+            with self.lock:
+                self.dead['%s|%s' % (source, serviceid)] = time.time() + self.cooldown
+
+    def save(self):
+        if self.path is None:
+            return
+        stamp = time.time()
+        data = {'catalogs': self.catalogs, 'dead': {k: v for k, v in self.dead.items() if v > stamp}}
+        try:
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(self.path + '.tmp', self.path)
+        except Exception as e:
+            log.warning("파일 저장 중 에러: %s", self.path)
+            log.warning(str(e))
+
+
+# 설정을 읽은 뒤 catalogfile을 쓰는 것으로 바꾼다
+catalog = ChannelCatalog(None, 0)
+
+
+def check_services(source, channels, services, service_id):
+    """요청할 채널만 돌려준다
+
+    최근 EPG가 없던 채널과 services(채널 목록을 모르면 None)에 없는 서비스 아이디는
+    빼고 돌려준다. service_id(channel)는 채널의 서비스 아이디.
+    """
+    result, skipped = [], 0
+    for channel in channels:
+        serviceid = service_id(channel)
+        if catalog.is_dead(source, serviceid):
+            log.debug('최근 EPG가 없던 채널이라 건너뜁니다: %s', channel)
+            skipped += 1
+        elif services is not None and serviceid not in services:
+            log.warning('없는 서비스 아이디입니다: %s', channel)
+        else:
+            result.append(channel)
+    if skipped:
+        log.info('%s: 최근 EPG가 없던 채널 %d개를 건너뜁니다.', source, skipped)
+        metrics.add(source, channels_skipped=skipped)
+    return result
+
+
+# 소스별 제목 정규식과 (제목, 부제, 회차, 재방송) 그룹 번호
+# 게으른 제목 그룹이 끝나는 자리마다 뒷부분을 다시 맞춰보므로 뒷부분은 길게 훑지 않게 쓴다.
+# 공백과 숫자 반복은 (?<!...)로 이어진 곳의 처음에서만 시작하고 괄호 안은 길이를 제한한다.
+TITLE_RULES = {
+    'LG': (re.compile(r'\s?(?:\[.*?\])?(.*?)(?:\[(.{0,200})\])?\s?(?:\(([\d,]+)회\))?\s?(<재>)?$'), 1, 2, 3, 4),
+    'SKB': (re.compile(r'^(.*?)(\(([\d,]+)회\))?(<(.{0,200})>)?(\((재)\))?$'), 1, 5, 3, 7),
+    'SK': (re.compile(r'^(.*?)(?:(?<!\s)\s*[\(<]([\d,회]+)[\)>])?(?:(?<!\s)\s*<([^<]{0,200}?)>)?(\((재)\))?$'), 1, 3, 2, 5),
+    'WAVVE': (re.compile(r'^(.*?)(?:(?<!\s)\s*[\(<]?(?<!\d)(\d+)회[\)>]?)?(?:\([월화수목금토일]?\))?(\([선별전주\(\)재방]{0,30}?재[\d방]?\))?(?<!\s)\s*(?:\[(.{1,200})\])?$'), 1, 4, 2, 3),
+}
+# 회차 0을 버리고 규칙에 맞지 않는 제목을 그대로 두는 소스. 나머지는 빈 제목이 된다
+TITLE_KEEP = {'SK', 'WAVVE'}
+_part_RE = re.compile(r'(.*) \(?(\d+부)\)?')
+
+
+@lru_cache(maxsize=16384)
+def parse_title(source, title):
+    """소스별 규칙으로 제목을 (제목, 부제, 회차, 재방송)으로 나눈다"""
+    pattern, name, sub, episode, rebroadcast = TITLE_RULES[source]
+    matches = pattern.match(title)
+    if not matches:
+        return (title.strip() if source in TITLE_KEEP else ''), '', '', False
+    episode = (matches.group(episode) or '').replace('회', '')
+    if episode == '0' and source in TITLE_KEEP:
+        episode = ''
+    return (matches.group(name) or '').strip(), (matches.group(sub) or '').strip(), episode, bool(matches.group(rebroadcast))
+
+
+@lru_cache(maxsize=16384)
+def parse_part(title):
+    """'제목 (1부)'를 ('제목', '1부')로 나눈다. 해당하지 않으면 None"""
+    matches = _part_RE.match(title)
+    return matches.groups() if matches else None
+
+
+def _intern(value):
+    return sys.intern(value) if value else ''
+
+
+class Programme:
+    """프로그램 하나. 모든 소스가 만들고 writeProgram()이 쓴다
+
+    편성표에는 같은 제목, 장르, 출연진, 시각이 계속 반복되므로 문자열 필드는
+    sys.intern()으로 하나만 남긴다. 종료 시각을 모르는 소스는 endTime을 비워두고
+    epgzip()에서 다음 프로그램의 시작 시각으로 채운다.
+    """
+    __slots__ = ('channelId', 'startTime', 'programName', 'subprogramName', 'desc', 'actors', 'producers',
+                 'category', 'episode', 'rebroadcast', 'rating', 'endTime', 'iconurl')
+
+    def __init__(self, channelId, startTime, programName='', subprogramName='', desc='', actors='', producers='',
+                 category='', episode='', rebroadcast=False, rating=0, endTime='', iconurl=''):
+        self.channelId = sys.intern(channelId) if isinstance(channelId, str) else channelId
+        self.startTime = _intern(startTime)
+        self.programName = _intern(programName)
+        self.subprogramName = _intern(subprogramName)
+        self.desc = _intern(desc)
+        self.actors = _intern(actors)
+        self.producers = _intern(producers)
+        self.category = _intern(category)
+        self.episode = _intern(episode)
+        self.rebroadcast = bool(rebroadcast)
+        self.rating = int(rating) if rating else 0
+        self.endTime = _intern(endTime)
+        self.iconurl = _intern(iconurl)
+
+    def fields(self):
+        """생성자 인자 순서의 목록 (상태 파일 저장용)"""
+        return [getattr(self, name) for name in self.__slots__]
+
+    def __reduce__(self):
+        # parse_pool에서 넘어올 때 생성자를 다시 거쳐 문자열을 intern한다
+        return Programme, tuple(self.fields())
+
+    def __eq__(self, other):
+        return isinstance(other, Programme) and self.fields() == other.fields()
+
+    def __repr__(self):
+        return 'Programme(%s)' % ', '.join(repr(x) for x in self.fields())
+
+
+def epgzip(epginfo):
+    """시작 시각 순서의 Programme 목록에서 다음 프로그램의 시작 시각을 종료 시각으로 채워 출력한다"""
+    if epginfo:
+        epginfo = iter(epginfo)
+        epg1 = next(epginfo)
+        for epg2 in epginfo:
+            epg1.endTime = epg2.startTime
+            writeProgram(epg1)
+            epg1 = epg2
+
+
+_spaces_RE = re.compile(' +')
+contentTypeDict = {
+    '교양': 'Arts / Culture (without music)',
+    '만화': 'Cartoons / Puppets',
+    '교육': 'Education / Science / Factual topics',
+    '취미': 'Leisure hobbies',
+    '드라마': 'Movie / Drama',
+    '영화': 'Movie / Drama',
+    '음악': 'Music / Ballet / Dance',
+    '뉴스': 'News / Current affairs',
+    '다큐': 'Documentary',
+    '라이프': 'Documentary',
+    '시사/다큐': 'Documentary',
+    '연예': 'Show / Game show',
+    '스포츠': 'Sports',
+    '홈쇼핑': 'Advertisement / Shopping'
+}
+
+
+def writeProgram(programdata):
+    sink = getattr(_xmlout, 'sink', None)
+    if sink is not None:
+        # generate()
+        sink.append(programdata)
+        _xmlout.programmes = getattr(_xmlout, 'programmes', 0) + 1
+        return
+    ChannelId = programdata.channelId
+    startTime = programdata.startTime
+    endTime = programdata.endTime
+    programName = escape(programdata.programName).strip()
+    subprogramName = escape(programdata.subprogramName).strip()
+    part = parse_part(unescape(programName))
+    if part:
+        programName = escape(part[0]).strip()
+        subprogramName = escape(part[1]) + ' ' + subprogramName
+        subprogramName = subprogramName.strip()
+    if programName is None:
+        programName = subprogramName
+    actors = escape(programdata.actors)
+    producers = escape(programdata.producers)
+    category = escape(programdata.category)
+    episode = programdata.episode
+    if episode:
+        try:
+            episode_ns = int(episode) - 1
+        except ValueError:
+            episode_ns = int(episode.split(',', 1)[0]) - 1
+        episode_ns = '0' + '.' + str(episode_ns) + '.' + '0' + '/' + '0'
+        episode_on = episode
+    rebroadcast = programdata.rebroadcast
+    if episode and addepisode == 'y':
+        programName = programName + ' (' + str(episode) + '회)'
+    if rebroadcast and (addrebroadcast == 'y'):
+        programName = programName + ' (재)'
+    if programdata.rating == 0:
+        rating = '전체 관람가'
+    else:
+        rating = '%s세 이상 관람가' % (programdata.rating)
+    if addverbose == 'y':
+        desc = programName
+        if subprogramName:
+            desc += '\n부제 : ' + subprogramName
+        if rebroadcast and (addrebroadcast == 'y'):
+            desc += '\n방송 : 재방송'
+        if episode:
+            desc += '\n회차 : ' + str(episode) + '회'
+        if category:
+            desc += '\n장르 : ' + category
+        if actors:
+            desc += '\n출연 : ' + actors.strip()
+        if producers:
+            desc += '\n제작 : ' + producers.strip()
+        desc += '\n등급 : ' + rating
+    else:
+        desc = ''
+    if programdata.desc:
+        desc += '\n' + escape(programdata.desc)
+    desc = _spaces_RE.sub(' ', desc)
+    contentType = ''
+    for key, value in contentTypeDict.items():
+        if key in category:
+            contentType = value
+    xml = ['  <programme start="%s +0900" stop="%s +0900" channel="%s">\n    <title lang="kr">%s</title>\n' % (startTime, endTime, ChannelId, programName)]
+    if subprogramName:
+        xml.append('    <sub-title lang="kr">%s</sub-title>\n' % subprogramName)
+    if addverbose == 'y':
+        xml.append('    <desc lang="kr">%s</desc>\n' % desc)
+        if actors or producers:
+            xml.append('    <credits>\n')
+            if actors:
+                for actor in actors.split(','):
+                    if actor.strip():
+                        xml.append('      <actor>%s</actor>\n' % actor.strip())
+            if producers:
+                for producer in producers.split(','):
+                    if producer.strip():
+                        xml.append('      <producer>%s</producer>\n' % producer.strip())
+            xml.append('    </credits>\n')
+    if category:
+        xml.append('    <category lang="kr">%s</category>\n' % category)
+    if contentType:
+        xml.append('    <category lang="en">%s</category>\n' % contentType)
+    if episode and addxmltvns == 'y':
+        xml.append('    <episode-num system="xmltv_ns">%s</episode-num>\n' % episode_ns)
+    if episode and addxmltvns != 'y':
+        xml.append('    <episode-num system="onscreen">%s</episode-num>\n' % episode_on)
+    if rebroadcast:
+        xml.append('    <previously-shown />\n')
+    if rating:
+        xml.append('    <rating system="KMRB">\n      <value>%s</value>\n    </rating>\n' % rating)
+    if programdata.iconurl:
+        xml.append('    <icon src="%s" />\n' % escape(programdata.iconurl))
+    xml.append('  </programme>\n')
+    xmlwrite(''.join(xml), ChannelId)
+    _xmlout.programmes = getattr(_xmlout, 'programmes', 0) + 1
+
+
+def writeChannel(ChannelId, ChannelNames, ChannelIconUrl):
+    if getattr(_xmlout, 'sink', None) is not None:
+        return
+    xml = ['  <channel id="%s">\n' % ChannelId]
+    xml.extend('    <display-name>%s</display-name>\n' % name for name in ChannelNames)
+    xml.append('    <icon src="%s" />\n  </channel>\n' % ChannelIconUrl)
+    xmlwrite(''.join(xml), ChannelId, 'channel')
+
+
+def writeSKPrograms(ChannelInfo, programs):
+    genre_code = {
+        '1': '드라마',
+        '2': '영화',
+        '4': '만화',
+        '8': '스포츠',
+        '9': '교육',
+        '11': '홈쇼핑',
+        '13': '예능',
+        '14': '시사/다큐',
+        '15': '음악',
+        '16': '라이프',
+        '17': '교양',
+        '18': '뉴스',
+    }
+    for program in programs:
+        programName, subprogramName, episode, rebroadcast = parse_title('SK', program['NM_TITLE'].replace('...', '>'))
+        startTime = program['DT_EVNT_START']
+        endTime = program['DT_EVNT_END']
+        desc = program['NM_SYNOP'] if program['NM_SYNOP'] else ''
+        if 'AdditionalInfoArray' in program:
+            info_array = program['AdditionalInfoArray'][0]
+            actors = info_array['NM_ACT'].replace('...', '').strip(', ') if info_array['NM_ACT'] else ''
+            producers = info_array['NM_DIRECTOR'].replace('...', '').strip(', ') if info_array['NM_DIRECTOR'] else ''
+        else:
+            actors, producers = '', ''
+        if program['CD_GENRE'] and (program['CD_GENRE'] in genre_code):
+            category = genre_code[program['CD_GENRE']]
+        else:
+            category = ''
+        rating = int(program['CD_RATING']) if program['CD_RATING'] else 0
+        writeProgram(Programme(ChannelInfo[0], startTime, programName, subprogramName, desc, actors, producers, category, episode, rebroadcast, rating, endTime=endTime))
+
+
+class ConfigError(ValueError):
+    """설정이나 설정 파일에 문제가 있음 (cli.main()에서 종료 코드 1이 된다)"""
+
+
+def load_json(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        raise ConfigError("파일 읽는 중 에러: %s: %s" % (file_path, str(e)))
+
+
+def dump_json(file_path, data):
+    try:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+    except Exception as e:
+        log.warning("파일 저장 중 에러: %s", file_path)
+        log.warning(str(e))
+
+
+def dump_channels(name_suffix, channels):
+    filename = os.path.join(__dirpath__, 'Channel_%s.json' % name_suffix)
+    headers = [{'last update': datetime.now().strftime('%Y/%m/%d %H:%M:%S'), 'total': len(channels)}]
+    dump_json(filename, headers + channels)
+
+
+class ChannelRegistry:
+    """Channel.json을 한번 읽어서 소스별로 나눠둔 채널 목록
+
+    Id로 채널과 Channel.json에서의 순서를 바로 찾는다. MyChannels(-c) 범위는 겹치지
+    않게 합친 구간 목록으로 들고 있다가 Id가 속하는지 이분 탐색으로 확인한다.
+    """
+    def __init__(self, channels):
+        self.channels = channels
+        self.by_id, self.by_source, self.positions = {}, {}, {}
+        for i, ch in enumerate(channels):
+            if 'Id' in ch:
+                if ch['Id'] in self.by_id:
+                    log.warning('채널 ID가 중복됩니다. 앞의 채널만 사용합니다: %s', ch['Id'])
+                else:
+                    self.by_id[ch['Id']] = ch
+                    self.positions[ch['Id']] = i
+            self.by_source.setdefault(ch['Source'], []).append(ch)
+        self.min_id, self.max_id = (min(self.by_id), max(self.by_id)) if self.by_id else (0, 0)
+        self.ranges, self.starts = [(self.min_id, self.max_id)], [self.min_id]
+
+    def ids(self):
+        """Channel.json의 채널이 XMLTV에서 쓰는 Id 목록 (Id가 없는 WAVVE, TVING 채널은 소스|ServiceId)"""
+        ids = {str(x) for x in self.by_id}
+        ids.update('%s|%s' % (ch['Source'].lower(), ch['ServiceId']) for source in ['WAVVE', 'TVING']
+                   for ch in self.batch(source) if 'Id' not in ch and 'ServiceId' in ch)
+        return ids
+
+    def select(self, spec):
+        """MyChannels 범위(예: '-3,5,7-9,11-', '*')로 고를 채널 Id 구간을 정한다
+
+        범위 문법이 잘못되었으면 ValueError
+        """
+        ranges = []
+        for r in spec.strip('"').strip("'").split(','):
+            first, last = self.min_id, self.max_id
+            if r.strip() != '*':
+                ends = r.split('-')
+                if len(ends) == 1:
+                    first = last = int(r)
+                elif len(ends) == 2:
+                    a, b = ends
+                    first = int(a) if a.strip() != '' else first
+                    last = int(b) if b.strip() != '' else last
+                else:
+                    raise ValueError(r)
+            if first <= last:
+                ranges.append((first, last))
+        merged = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        self.ranges, self.starts = merged, [x[0] for x in merged]
+
+    def selected(self, ch):
+        """MyChannels 범위에 드는 채널인지 (Id가 없거나 중복된 채널은 고르지 않음)"""
+        cid = ch.get('Id')
+        if cid is None or self.by_id.get(cid) is not ch:
+            return False
+        i = bisect_right(self.starts, cid) - 1
+        return i >= 0 and cid <= self.ranges[i][1]
+
+    def position(self, ch):
+        """Channel.json에서의 순서"""
+        return self.positions[ch['Id']]
+
+    def batch(self, source):
+        """소스의 채널 목록 (Channel.json 순서)"""
+        return self.by_source.get(source, [])
+
+
+class HostLimiter:
+    """호스트 하나에 대한 token bucket
+
+    rate(초당 요청수)만큼 토큰이 차고 burst개까지 쌓인다. 429/5xx나 연결 에러,
+    평소보다 긴 응답이 오면 rate와 동시 요청수를 절반으로 줄이고
+    정상 응답이 이어지면 설정값까지 조금씩 되돌린다.
+    """
+    def __init__(self, rate, burst):
+        self.max_rate = self.rate = float(rate)
+        self.burst = self.tokens = self.limit = max(int(burst), 1)
+        self.min_rate = self.max_rate / 16
+        self.inflight = 0
+        self.latency = None
+        self.stamp = time.monotonic()
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.inflight >= self.limit:
+                self.cond.wait()
+            self.inflight += 1
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def release(self, status, elapsed, retry_after=0):
+        with self.cond:
+            self.inflight -= 1
+            slow = self.latency is not None and elapsed > 3 * self.latency
+            if status is None or status == 429 or status >= 500 or slow:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.limit = max(1, self.limit // 2)
+                self.tokens -= retry_after * self.rate
+                log.debug('요청 속도를 줄입니다: rate=%.2f limit=%d status=%s elapsed=%.2f', self.rate, self.limit, status, elapsed)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 8)
+                self.limit = min(self.burst, self.limit + 1)
+            self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+            self.cond.notify_all()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(url):
+    host = urlparse(url).hostname
+    with _limiters_lock:
+        if host not in _limiters:
+            rate, burst = host_limits.get(host, (1 / req_sleep, 1))
+            _limiters[host] = HostLimiter(rate, burst)
+        return _limiters[host]
+
+
+class RunMetrics:
+    """이번 실행의 소스별, 호스트별 통계
+
+    소스별로 걸린 시간, 출력한 프로그램 수, 파싱 시간과 에러를,
+    호스트별로 요청 수, 에러, 받은 바이트, 응답 시간 분포, 속도 제한으로 기다린 시간,
+    응답 캐시 적중을 모은다. 끝나면 JSON과 Prometheus textfile 형식으로 저장한다.
+    """
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.sources, self.hosts = {}, {}
+
+    def add(self, source, **values):
+        with self.lock:
+            stats = self.sources.setdefault(source, {'seconds': 0.0, 'programmes': 0, 'parse_seconds': 0.0, 'parse_errors': 0})
+            for k, v in values.items():
+                stats[k] = stats.get(k, 0) + v
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = {'requests': 0, 'errors': 0, 'bytes': 0, 'sleep_seconds': 0.0, 'cache_hits': 0, 'cache_misses': 0,
+                                'latency_sum': 0.0, 'latency_buckets': [0] * len(self.BUCKETS)}
+        return self.hosts[host]
+
+    def request(self, host, elapsed, size, error, sleep=0.0):
+        with self.lock:
+            stats = self._host(host)
+            stats['requests'] += 1
+            stats['errors'] += 1 if error else 0
+            stats['bytes'] += size
+            stats['sleep_seconds'] += sleep
+            stats['latency_sum'] += elapsed
+            for i, le in enumerate(self.BUCKETS):
+                if elapsed <= le:
+                    stats['latency_buckets'][i] += 1
+
+    def cache(self, host, hit):
+        with self.lock:
+            self._host(host)['cache_hits' if hit else 'cache_misses'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            hosts = {}
+            for host, stats in self.hosts.items():
+                lookups = stats['cache_hits'] + stats['cache_misses']
+                hosts[host] = dict(stats, latency_buckets=dict(zip([str(le) for le in self.BUCKETS], stats['latency_buckets'])),
+                                   cache_hit_ratio=stats['cache_hits'] / lookups if lookups else None)
+            return {'started': self.started, 'seconds': time.time() - self.started,
+                    'sources': {k: dict(v) for k, v in self.sources.items()}, 'hosts': hosts}
+
+    def prometheus(self, snapshot):
+        lines = ['# TYPE epg2xml_run_seconds gauge', 'epg2xml_run_seconds %.3f' % snapshot['seconds'],
+                 '# TYPE epg2xml_run_timestamp_seconds gauge', 'epg2xml_run_timestamp_seconds %d' % (snapshot['started'] + snapshot['seconds'])]
+        for name in sorted({k for v in snapshot['sources'].values() for k in v}):
+            lines.append('# TYPE epg2xml_source_%s gauge' % name)
+            lines.extend('epg2xml_source_%s{source="%s"} %s' % (name, source, stats[name]) for source, stats in sorted(snapshot['sources'].items()) if name in stats)
+        for name in ['requests', 'errors', 'bytes', 'sleep_seconds', 'cache_hits', 'cache_misses']:
+            lines.append('# TYPE epg2xml_http_%s gauge' % name)
+            lines.extend('epg2xml_http_%s{host="%s"} %s' % (name, host, stats[name]) for host, stats in sorted(snapshot['hosts'].items()))
+        lines.append('# TYPE epg2xml_http_request_seconds histogram')
+        for host, stats in sorted(snapshot['hosts'].items()):
+            for le, count in stats['latency_buckets'].items():
+                lines.append('epg2xml_http_request_seconds_bucket{host="%s",le="%s"} %d' % (host, le, count))
+            lines.append('epg2xml_http_request_seconds_bucket{host="%s",le="+Inf"} %d' % (host, stats['requests']))
+            lines.append('epg2xml_http_request_seconds_sum{host="%s"} %.3f' % (host, stats['latency_sum']))
+            lines.append('epg2xml_http_request_seconds_count{host="%s"} %d' % (host, stats['requests']))
+        return '\n'.join(lines) + '\n'
+
+    def save(self, json_path, prom_path):
+        snapshot = self.snapshot()
+        for source, stats in sorted(snapshot['sources'].items()):
+            log.info('%s: %.1f초, 프로그램 %d개, 파싱 %.2f초, 파싱 에러 %d개', source, stats['seconds'], stats['programmes'], stats['parse_seconds'], stats['parse_errors'])
+        for path, text in [(json_path, lambda: json.dumps(snapshot, ensure_ascii=False, indent=2)), (prom_path, lambda: self.prometheus(snapshot))]:
+            if not path:
+                continue
+            try:
+                # textfile collector가 쓰다 만 파일을 읽지 않도록 바꿔치기
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(text())
+                os.replace(path + '.tmp', path)
+            except Exception as e:
+                log.warning("파일 저장 중 에러: %s", path)
+                log.warning(str(e))
+
+
+metrics = RunMetrics()
+
+
+class ResponseCache:
+    """request_data() 응답을 저장하는 sqlite 캐시
+
+    (method, url, params)를 키로 본문과 ETag/Last-Modified를 저장한다.
+    유효 시간이 지난 항목은 조건부 요청으로 재검증하고,
+    전체 크기가 max_size를 넘으면 가장 오래 쓰지 않은 항목부터 지운다.
+    """
+    def __init__(self, path, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored REAL, accessed REAL, etag TEXT, modified TEXT, body TEXT, size INTEGER)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        self.size = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+
+    @staticmethod
+    def key(method, url, params):
+        raw = json.dumps([method, url, sorted((params or {}).items())], ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute('SELECT stored, etag, modified, body FROM cache WHERE key=?', (key,)).fetchone()
+            if row is not None:
+                self.db.execute('UPDATE cache SET accessed=? WHERE key=?', (time.time(), key))
+        return row
+
+    def put(self, key, body, etag=None, modified=None):
+        size = len(body.encode('utf-8'))
+        now = time.time()
+        with self.lock:
+            old = self.db.execute('SELECT size FROM cache WHERE key=?', (key,)).fetchone()
+            self.size += size - (old[0] if old else 0)
+            self.db.execute('REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?)', (key, now, now, etag, modified, body, size))
+            if self.size > self.max_size:
+                self.evict()
+
+    def touch(self, key):
+        with self.lock:
+            self.db.execute('UPDATE cache SET stored=?, accessed=? WHERE key=?', (time.time(), time.time(), key))
+
+    def evict(self):
+        target = self.max_size * 0.9
+        for key, size in self.db.execute('SELECT key, size FROM cache ORDER BY accessed').fetchall():
+            if self.size <= target:
+                break
+            self.db.execute('DELETE FROM cache WHERE key=?', (key,))
+            self.size -= size
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class DetailCache:
+    """WAVVE 프로그램 상세 정보를 실행 간에 재사용하는 sqlite 저장소
+
+    programid별로 contentid와 상세 정보(WAVVE_DETAIL_KEYS 항목만)를 저장한다.
+    ttl이 지난 항목은 다시 가져오고, max_entries개를 넘으면
+    가장 오래 쓰지 않은 항목부터 지운다.
+    """
+    def __init__(self, path, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS details (programid TEXT PRIMARY KEY, contentid TEXT, detail TEXT, fetched REAL, accessed REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS details_accessed ON details (accessed)')
+        self.count = self.db.execute('SELECT COUNT(*) FROM details').fetchone()[0]
+
+    def get(self, programid):
+        with self.lock:
+            row = self.db.execute('SELECT detail, fetched FROM details WHERE programid=?', (programid,)).fetchone()
+            if row is None or time.time() - row[1] >= self.ttl:
+                return None
+            self.db.execute('UPDATE details SET accessed=? WHERE programid=?', (time.time(), programid))
+        return json.loads(row[0])
+
+    def put(self, programid, contentid, detail):
+        now = time.time()
+        with self.lock:
+            if self.db.execute('SELECT 1 FROM details WHERE programid=?', (programid,)).fetchone() is None:
+                self.count += 1
+            self.db.execute('REPLACE INTO details VALUES (?, ?, ?, ?, ?)', (programid, contentid, json.dumps(detail, ensure_ascii=False), now, now))
+            if self.count > self.max_entries:
+                excess = self.count - int(self.max_entries * 0.9)
+                self.db.execute('DELETE FROM details WHERE programid IN (SELECT programid FROM details ORDER BY accessed LIMIT ?)', (excess,))
+                self.count -= excess
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class RequestArchive:
+    """request_data()의 요청과 응답을 기록하는 sqlite 파일 (DIR/requests.sqlite)
+
+    record 모드에서는 (method, url, params, status, body)를 요청 순서대로 저장하고,
+    replay 모드에서는 네트워크와 대기 없이 기록된 응답을 돌려준다.
+    같은 요청이 여러 번 기록되어 있으면 순서대로, 다 쓰면 마지막 응답을 준다.
+    날짜에 따라 요청이 달라지므로 기록한 시각도 함께 저장한다.
+    """
+    def __init__(self, path, replay=False):
+        self.path = path
+        self.replay = replay
+        self.lock = threading.Lock()
+        self.served = {}
+        filename = os.path.join(path, 'requests.sqlite')
+        if replay:
+            if not os.path.exists(filename):
+                raise FileNotFoundError(filename)
+        else:
+            os.makedirs(path, exist_ok=True)
+        self.db = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        if not replay:
+            self.db.execute('DROP TABLE IF EXISTS requests')
+            self.db.execute('DROP TABLE IF EXISTS meta')
+            self.db.execute('CREATE TABLE requests (seq INTEGER PRIMARY KEY, key TEXT, method TEXT, url TEXT, params TEXT, status INTEGER, body BLOB)')
+            self.db.execute('CREATE INDEX requests_key ON requests (key)')
+            self.db.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)')
+            self.db.execute('INSERT INTO meta VALUES (?, ?)', ('now', now.strftime('%Y%m%d%H%M%S')))
+            self.db.execute('INSERT INTO meta VALUES (?, ?)', ('version', __version__))
+        self.now = datetime.strptime(self.db.execute("SELECT value FROM meta WHERE name='now'").fetchone()[0], '%Y%m%d%H%M%S')
+        self.count = self.db.execute('SELECT COUNT(*) FROM requests').fetchone()[0]
+
+    def put(self, method, url, params, status, body):
+        raw = json.dumps(params or {}, ensure_ascii=False, sort_keys=True, default=str)
+        blob = zlib.compress(body.encode('utf-8')) if body is not None else None
+        with self.lock:
+            self.db.execute('INSERT INTO requests (key, method, url, params, status, body) VALUES (?, ?, ?, ?, ?, ?)',
+                            (ResponseCache.key(method, url, params), method, url, raw, status, blob))
+            self.count += 1
+
+    def get(self, method, url, params):
+        """(status, body)를 돌려준다. 기록에 없는 요청이면 None"""
+        key = ResponseCache.key(method, url, params)
+        with self.lock:
+            rows = self.db.execute('SELECT status, body FROM requests WHERE key=? ORDER BY seq', (key,)).fetchall()
+            if not rows:
+                return None
+            n = self.served.get(key, 0)
+            self.served[key] = n + 1
+        status, blob = rows[min(n, len(rows) - 1)]
+        return status, zlib.decompress(blob).decode('utf-8') if blob is not None else None
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def request_data(url, params, method='GET', output='html', session=None, ret='', headers=None):
+    sess = requests.Session() if session is None else session
+    if output.lower() not in ['html', 'json']:
+        log.error('요청 중 에러: Unexpected output type: %s' % output)
+        return ret
+    decode = json.loads if output.lower() == 'json' else str
+
+    # 기록된 응답만 사용
+    if archive is not None and archive.replay:
+        recorded = archive.get(method, url, params)
+        if recorded is None:
+            log.error('요청 중 에러: 기록에 없는 요청입니다: %s %s' % (url, params))
+            return ret
+        status, body = recorded
+        if body is None or (status is not None and status >= 400):
+            log.error('요청 중 에러: 기록된 응답이 에러입니다: %s %s' % (status, url))
+            return ret
+        try:
+            return decode(body)
+        except ValueError as e:
+            log.error('요청 중 에러: %s' % str(e))
+            return ret
+
+    # 캐시가 유효하면 요청하지 않음
+    key, cached, headers = None, None, dict(headers or {})
+    host = urlparse(url).hostname
+    ttl = cache_ttl.get(host, 0) if cache is not None else 0
+    if ttl:
+        key = cache.key(method, url, params)
+        cached = cache.get(key)
+        if cached is not None:
+            stored, etag, modified, body = cached
+            if time.time() - stored < ttl:
+                try:
+                    ret = decode(body)
+                except ValueError:
+                    cached = None
+                else:
+                    metrics.cache(host, True)
+                    if archive is not None:
+                        archive.put(method, url, params, 200, body)
+                    return ret
+            else:
+                if etag:
+                    headers['If-None-Match'] = etag
+                if modified:
+                    headers['If-Modified-Since'] = modified
+
+    limiter = get_limiter(url)
+    sleep = limiter.acquire()
+    status, body, size, retry_after, error, start = None, None, 0, 0, False, time.monotonic()
+    try:
+        if method == 'GET':
+            r = sess.get(url, params=params, headers=headers, timeout=req_timeout)
+        elif method == 'POST':
+            r = sess.post(url, data=params, headers=headers, timeout=req_timeout)
+        else:
+            raise ValueError('Unexpected method: %s', method)
+        status, size = r.status_code, len(r.content)
+        if status == 429 and r.headers.get('Retry-After', '').isdigit():
+            retry_after = int(r.headers['Retry-After'])
+        if status == 304 and cached is not None:
+            body = cached[3]
+            ret = decode(body)
+            cache.touch(key)
+        else:
+            body = r.text
+            r.raise_for_status()
+            ret = decode(body)
+            if key is not None:
+                cache.put(key, body, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+    except Exception as e:
+        log.error('요청 중 에러: %s' % str(e))
+        error = True
+    finally:
+        elapsed = time.monotonic() - start
+        limiter.release(status, elapsed, retry_after)
+        metrics.request(host, elapsed, size, error, sleep)
+        if ttl:
+            metrics.cache(host, status == 304 and cached is not None)
+    if archive is not None:
+        archive.put(method, url, params, status, body)
+    return ret
+
+
+# XML은 요소 단위로 만들어 UTF-8 바이너리로 xmlout에 쓴다
+# 스레드별 버퍼가 있으면 그곳에 쓴다 (parallel 모드)
+# 스레드별 sink가 있으면 XML 대신 Programme을 모은다 (generate)
+# fragments가 있으면 채널 요소는 채널별 조각 파일로 보낸다
+xmlout = sys.stdout.buffer
+fragments = None
+_xmlout = threading.local()
+
+
+def xml_header():
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE tv SYSTEM "xmltv.dtd">\n\n<tv generator-info-name="epg2xml ' + __version__ + '">\n'
+
+
+class TeeWriter:
+    """같은 내용을 여러 파일에 쓴다 (원본과 압축본을 한번에 만들 때)"""
+    def __init__(self, files):
+        self.files = files
+
+    def write(self, data):
+        for f in self.files:
+            f.write(data)
+        return len(data)
+
+    def flush(self):
+        for f in self.files:
+            f.flush()
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+def open_xmlfile(path, level=None):
+    """확장자가 .gz/.xz이면 압축하면서 쓰는 파일을 연다"""
+    if path.endswith('.gz'):
+        raw = gzip.open(path, 'wb', compresslevel=6 if level is None else level)
+    elif path.endswith('.xz'):
+        raw = lzma.open(path, 'wb', preset=6 if level is None else level)
+    else:
+        return open(path, 'wb', buffering=1024 * 1024)
+    return io.BufferedWriter(raw, buffer_size=1024 * 1024)
+
+
+def xmlwrite(text, ChannelId=None, part='programme'):
+    if fragments is not None and ChannelId is not None:
+        fragments.write(ChannelId, part, text.encode('utf-8'))
+    else:
+        (getattr(_xmlout, 'buf', None) or xmlout).write(text.encode('utf-8'))
+
+
+class FragmentStore:
+    """채널별 XML 조각을 path/channel/<채널 Id>.xml(<channel>)과
+    path/programme/<채널 Id>.xml(<programme>)로 나눠 저장하고 합친다
+
+    소스는 채널을 하나씩 차례로 쓰므로 스레드가 다음 채널을 쓰기 시작하면 앞 채널의
+    조각을 .tmp에 쓰고 os.replace로 바꾼다. 조각은 소스별로 동시에 만들어지고 합치는
+    쪽에는 다 쓴 조각만 보인다. 합칠 때는 XMLTV 순서대로 <channel>을 모두 쓴 뒤
+    <programme>을 쓴다. 이번에 고르지 않았어도 Channel.json에 있는 채널의 조각은 같이
+    합치므로 채널 하나만 다시 가져올 수 있고, Channel.json에서 빠졌거나 Id가 바뀐 채널의
+    조각은 지운다. 이번에 프로그램을 하나도 받지 못한 채널 (요청 실패, 죽은 채널 건너뜀)은
+    있던 프로그램 조각을 그대로 둔다.
+    """
+    PARTS = ('channel', 'programme')
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = {}   # 채널 Id: {부분: 아직 저장하지 않은 XML 조각 목록}
+        for part in self.PARTS:
+            os.makedirs(os.path.join(path, part), exist_ok=True)
+
+    def filename(self, part, ChannelId):
+        return os.path.join(self.path, part, quote(ChannelId, safe='') + '.xml')
+
+    def write(self, ChannelId, part, data):
+        ChannelId = str(ChannelId)
+        with self.lock:
+            self.pending.setdefault(ChannelId, {x: [] for x in self.PARTS})[part].append(data)
+        # run_source() 안에서만 채널이 바뀌는 것을 본다 (getEpg()의 <channel>은 모아둔다)
+        current = getattr(_xmlout, 'fragment', None)
+        if current is not None and current != ChannelId:
+            if current:
+                self.commit(current)
+            _xmlout.fragment = ChannelId
+
+    def commit(self, ChannelId):
+        with self.lock:
+            data = self.pending.pop(ChannelId, None)
+        if data is None:
+            return
+        for part in self.PARTS:
+            path = self.filename(part, ChannelId)
+            if not data[part]:
+                if part == 'programme' and os.path.exists(path):
+                    log.warning('프로그램을 받지 못해 이전 조각을 그대로 씁니다: %s', ChannelId)
+                continue
+            with open(path + '.tmp', 'wb') as f:
+                f.write(b''.join(data[part]))
+            os.replace(path + '.tmp', path)
+
+    def commit_all(self):
+        for ChannelId in list(self.pending):
+            self.commit(ChannelId)
+
+    def ids(self, part):
+        """part 조각이 있는 채널 Id 목록 (숫자 Id는 숫자 순서로 먼저, 나머지는 이름 순서로)"""
+        def key(cid):
+            return (0, int(cid), '') if cid.isdigit() else (1, 0, cid)
+        return sorted((unquote(x[:-len('.xml')]) for x in os.listdir(os.path.join(self.path, part)) if x.endswith('.xml')), key=key)
+
+    def files(self):
+        """합칠 순서대로의 조각 파일 목록 (<channel> 조각 모두, 그 다음 <programme> 조각)"""
+        return [self.filename(part, x) for part in self.PARTS for x in self.ids(part)]
+
+    def prune(self, known):
+        """known(Channel.json의 채널 Id)에 없는 채널의 조각을 지운다"""
+        removed = 0
+        for part in self.PARTS:
+            for ChannelId in self.ids(part):
+                if ChannelId not in known:
+                    os.remove(self.filename(part, ChannelId))
+                    removed += 1
+        if removed:
+            log.info('Channel.json에 없는 채널의 조각 %d개를 지웠습니다: %s', removed, self.path)
+
+    def assemble(self, out):
+        """조각을 차례로 out에 이어 붙인다. 압축하지 않는 파일이나 표준출력이면 os.sendfile을 쓴다"""
+        raw = getattr(out, 'raw', None) if isinstance(out, io.BufferedWriter) else None
+        sendfile = hasattr(os, 'sendfile') and isinstance(raw, io.FileIO)
+        count = size = 0
+        for path in self.files():
+            with open(path, 'rb') as f:
+                length = os.fstat(f.fileno()).st_size
+                offset = 0
+                if sendfile:
+                    out.flush()
+                    try:
+                        while offset < length:
+                            sent = os.sendfile(raw.fileno(), f.fileno(), offset, length - offset)
+                            if sent == 0:
+                                break
+                            offset += sent
+                    except OSError:
+                        sendfile = False
+                    f.seek(offset)
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    out.write(chunk)
+            count += 1
+            size += length
+        log.info('채널 조각 %d개(%.1fMB)를 합쳤습니다: %s', count, size / 1048576, self.path)
+
+
+def buffered(func, *args):
+    _xmlout.buf = BytesIO()
+    try:
+        func(*args)
+        return _xmlout.buf.getvalue()
+    finally:
+        _xmlout.buf = None
+
+
+# https://stackoverflow.com/a/22273639
+_illegal_unichrs = [(0x00, 0x08), (0x0B, 0x0C), (0x0E, 0x1F), (0x7F, 0x84), (0x86, 0x9F), (0xFDD0, 0xFDDF), (0xFFFE, 0xFFFF)]
+if sys.maxunicode >= 0x10000:  # not narrow build
+    _illegal_unichrs.extend([
+        (0x1FFFE, 0x1FFFF), (0x2FFFE, 0x2FFFF), (0x3FFFE, 0x3FFFF), (0x4FFFE, 0x4FFFF),
+        (0x5FFFE, 0x5FFFF), (0x6FFFE, 0x6FFFF), (0x7FFFE, 0x7FFFF), (0x8FFFE, 0x8FFFF),
+        (0x9FFFE, 0x9FFFF), (0xAFFFE, 0xAFFFF), (0xBFFFE, 0xBFFFF), (0xCFFFE, 0xCFFFF),
+        (0xDFFFE, 0xDFFFF), (0xEFFFE, 0xEFFFF), (0xFFFFE, 0xFFFFF), (0x10FFFE, 0x10FFFF)
+    ])
+# 허용되지 않는 문자는 공백으로, &<>는 엔티티로 한번에 바꾼다
+_escape_table = {c: ' ' for (low, high) in _illegal_unichrs for c in range(low, high + 1)}
+_escape_table.update({ord('&'): '&amp;', ord('<'): '&lt;', ord('>'): '&gt;'})
+
+
+@lru_cache(maxsize=65536)
+def escape(s):
+    return s.translate(_escape_table)
+
+
+def unescape(s):
+    # xml.sax.saxutils.unescape와 같음 (saxutils는 urllib.request까지 불러와 시작이 느려짐)
+    return s.replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&')
+
+
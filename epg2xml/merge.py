@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""여러 XMLTV 파일을 채널, 시작 시각 순서로 합친다
+
+    python epg2xml.py merge [-o xmltv.xml] A.xml B.xml.gz ...
+
+파일은 iterparse(lxml이 없으면 xml.etree)로 요소 하나씩 읽고 programme은 buffer개씩 정렬해서 임시 파일로
+내보낸 뒤 heapq.merge로 합치므로 입력이 얼마나 크든 메모리는 buffer개 정도만 쓴다.
+(메모리에 남는 것은 channel 요소뿐) 같은 Id의 channel은 앞의 파일 것만 남기고,
+같은 채널에서 시간이 겹치는 programme은 앞의 파일 것을 남긴다.
+"""
+import os
+import re
+import sys
+import gzip
+import lzma
+import heapq
+import pickle
+import argparse
+import calendar
+import tempfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+
+from epg2xml import core
+from epg2xml.core import log
+
+_tz_RE = re.compile(r'[+-]\d{4}$')
+
+
+def open_xmltv(path):
+    """gzip, xz로 압축된 파일은 확장자가 아니라 내용을 보고 풀면서 연다"""
+    with open(path, 'rb') as f:
+        magic = f.read(6)
+    if magic[:2] == b'\x1f\x8b':
+        return gzip.open(path, 'rb')
+    if magic == b'\xfd7zXZ\x00':
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+@lru_cache(maxsize=65536)
+def xmltv_time(value):
+    """XMLTV 시각(YYYYMMDDhhmmss +hhmm)을 UTC 초로 바꾼다. 시간대가 없으면 UTC로 본다"""
+    parts = value.split()
+    t = datetime.strptime(parts[0][:14].ljust(14, '0'), '%Y%m%d%H%M%S')
+    seconds = calendar.timegm(t.timetuple())
+    if len(parts) > 1 and _tz_RE.match(parts[1]):
+        offset = (int(parts[1][1:3]) * 60 + int(parts[1][3:])) * 60
+        seconds += -offset if parts[1][0] == '+' else offset
+    return seconds
+
+
+def etree():
+    # lxml이 있으면 (htmlparser가 lxml) iterparse와 tostring이 몇 배 빠르다
+    return core.lxml_etree if core.htmlparser == 'lxml' else ET
+
+
+def element_xml(elem):
+    elem.tail = None
+    return ('  ' + etree().tostring(elem, encoding='unicode') + '\n').encode('utf-8')
+
+
+def read_xmltv(path, priority, channels, stats):
+    """XMLTV 파일 하나에서 programme을 ((채널, 시작, 우선순위), 종료, xml)로 하나씩 돌려준다
+
+    channel 요소는 channels에 처음 나온 것만 모은다. 읽은 요소는 바로 지운다.
+    """
+    with open_xmltv(path) as f:
+        context = etree().iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event != 'end' or elem.tag not in ('channel', 'programme'):
+                continue
+            if elem.tag == 'channel':
+                cid = elem.get('id')
+                if cid not in channels:
+                    channels[cid] = element_xml(elem)
+                else:
+                    stats['channels_duplicated'] += 1
+            else:
+                stats['programmes_in'] += 1
+                try:
+                    if elem.get('channel') is None:
+                        raise ValueError
+                    start = xmltv_time(elem.get('start'))
+                    stop = xmltv_time(elem.get('stop')) if elem.get('stop') else start
+                except (AttributeError, ValueError):
+                    log.warning('채널이나 시각을 알 수 없는 프로그램입니다: %s %s %s', path, elem.get('channel'), elem.get('start'))
+                    stats['programmes_invalid'] += 1
+                else:
+                    # 종료 시각이 없거나 잘못되었으면 1초짜리로 본다 (같은 시각에 시작하는 것만 겹침)
+                    yield (elem.get('channel'), start, priority), max(stop, start + 1), element_xml(elem)
+            root.clear()
+
+
+def spill(records, tmpdir):
+    """정렬한 records를 임시 파일에 쓰고 경로를 돌려준다"""
+    records.sort(key=itemgetter(0))
+    fd, path = tempfile.mkstemp(prefix='merge.', suffix='.run', dir=tmpdir)
+    with os.fdopen(fd, 'wb', buffering=1024 * 1024) as f:
+        for record in records:
+            pickle.dump(record, f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def read_run(path):
+    with open(path, 'rb', buffering=1024 * 1024) as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def resolve(records, stats):
+    """채널, 시작 시각 순서의 records에서 시간이 겹치면 우선순위가 높은(숫자가 작은) 것만 남긴다
+
+    끝나지 않은 프로그램만 pending에 두므로 채널 하나에서 동시에 겹치는 만큼만 메모리를 쓴다.
+    같은 파일의 프로그램끼리는 겹쳐도 그대로 둔다.
+    """
+    channel, pending = None, []     # pending: [시작, 종료, 우선순위, xml] 시작 순서
+    for (cid, start, priority), stop, xml in records:
+        if cid != channel:
+            for x in pending:
+                yield x[3]
+            channel, pending = cid, []
+        while pending and pending[0][1] <= start:
+            yield pending.pop(0)[3]
+        overlaps = [x for x in pending if x[0] < stop and start < x[1]]
+        if any(x[2] < priority for x in overlaps):
+            stats['programmes_dropped'] += 1
+            continue
+        worse = [x for x in overlaps if x[2] > priority]
+        if worse:
+            stats['programmes_dropped'] += len(worse)
+            pending = [x for x in pending if x not in worse]
+        pending.append([start, stop, priority, xml])
+    for x in pending:
+        yield x[3]
+
+
+def merge(inputs, out, buffer=50000, tmpdir=None):
+    """inputs(앞의 것이 우선)를 합쳐 out에 XMLTV로 쓰고 통계를 돌려준다"""
+    stats = dict.fromkeys(['channels', 'channels_duplicated', 'programmes_in', 'programmes_invalid', 'programmes_dropped', 'programmes_out', 'runs'], 0)
+    channels = {}
+    with tempfile.TemporaryDirectory(prefix='epg2xml.', dir=tmpdir) as tmp:
+        runs, records = [], []
+        for priority, path in enumerate(inputs):
+            for record in read_xmltv(path, priority, channels, stats):
+                records.append(record)
+                if len(records) >= buffer:
+                    runs.append(spill(records, tmp))
+                    records = []
+        records.sort(key=itemgetter(0))
+        stats['runs'] = len(runs)
+        stats['channels'] = len(channels)
+
+        out.write(core.xml_header().encode('utf-8'))
+        for xml in channels.values():
+            out.write(xml)
+        channels.clear()
+        merged = heapq.merge(*[read_run(x) for x in runs], records, key=itemgetter(0))
+        for xml in resolve(merged, stats):
+            out.write(xml)
+            stats['programmes_out'] += 1
+        out.write(b'</tv>\n')
+    return stats
+
+
+def main(argv=None):
+    from epg2xml.cli import logfile, setup_logging
+
+    parser = argparse.ArgumentParser(prog='epg2xml merge', description='여러 XMLTV 파일을 채널, 시작 시각 순서로 합친다')
+    parser.add_argument('inputs', nargs='+', metavar='XMLTV', help='합칠 XMLTV 파일 (gz, xz 압축 가능), 시간이 겹치면 앞의 파일을 남김')
+    parser.add_argument('-o', '--outfile', metavar='XMLTVFILE', help='합친 EPG를 파일로 저장, .gz/.xz로 끝나면 압축 (기본값: 화면에 출력)')
+    parser.add_argument('--buffer', type=int, default=50000, help='메모리에서 정렬하는 프로그램 수, 넘으면 임시 파일로 내보냄 (기본값: 50000)')
+    parser.add_argument('--tmpdir', help='임시 파일 디렉토리 (기본값: 시스템 임시 디렉토리)')
+    parser.add_argument('--logfile', default=logfile, help='로그 파일 경로 (기본값: %s)' % logfile)
+    parser.add_argument('--loglevel', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO', help='로그 레벨 (기본값: INFO)')
+    args = parser.parse_args(argv)
+    setup_logging(args.logfile, args.loglevel)
+    if args.buffer < 1:
+        log.error("buffer는 1 이상만 가능합니다.")
+        return 1
+
+    out = core.open_xmlfile(args.outfile) if args.outfile else sys.stdout.buffer
+    try:
+        stats = merge(args.inputs, out, args.buffer, args.tmpdir)
+    except (OSError, SyntaxError) as e:
+        log.error('XMLTV 파일을 합치지 못했습니다: %s', str(e))
+        return 1
+    finally:
+        if out is sys.stdout.buffer:
+            out.flush()
+        else:
+            out.close()
+    log.info('%d개 파일을 합쳤습니다: 채널 %d개 (중복 %d개), 프로그램 %d개 중 %d개 (겹쳐서 버림 %d개, 시각 오류 %d개), 임시 파일 %d개',
+             len(args.inputs), stats['channels'], stats['channels_duplicated'], stats['programmes_in'], stats['programmes_out'],
+             stats['programmes_dropped'], stats['programmes_invalid'], stats['runs'])
+    return 0